@@ -0,0 +1,149 @@
+import logging
+from datetime import MAXYEAR, MINYEAR, datetime, timedelta
+from sqlalchemy import func, select
+from app import db
+from models import Disaster, DisasterType, State, RiskAssessment, DisasterAlert, DisasterDailyRollup
+from rollups import MAX_TIMESERIES_BUCKETS, period_count, rollup_series
+
+logger = logging.getLogger(__name__)
+
+
+# Resolve the reporting period from the year / from / to request arguments
+def resolve_period(year=None, date_from=None, date_to=None, granularity='month'):
+    """
+    Work out the [start, end) window used for period-based statistics.
+
+    Args:
+        year: Optional calendar year
+        date_from: Optional inclusive start date (datetime); without it a
+            range starts on the first day with any disasters
+        date_to: Optional inclusive end date (datetime)
+        granularity: Bucket size the window is reported in
+
+    Returns:
+        Tuple of (start, end, filtered) where filtered is False when the
+        caller asked for the default view (current year for the monthly
+        chart, all-time for everything else)
+
+    Raises:
+        ValueError: If the year or dates are out of range, or the window
+            holds more than MAX_TIMESERIES_BUCKETS buckets
+    """
+    if date_from or date_to:
+        end = (date_to or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+        if end.year >= MAXYEAR:
+            raise ValueError(f"'to' must be before {MAXYEAR}-01-01")
+        # The end date is inclusive, so move to the start of the next day
+        end = datetime.fromordinal(end.toordinal() + 1)
+        start = date_from or min(first_disaster_day() or end, end - timedelta(days=1))
+        filtered = True
+    elif year is not None:
+        if not MINYEAR <= year < MAXYEAR:
+            raise ValueError(f"'year' must be between {MINYEAR} and {MAXYEAR - 1}")
+        start, end, filtered = datetime(year, 1, 1), datetime(year + 1, 1, 1), True
+    else:
+        current_year = datetime.now().year
+        start, end, filtered = datetime(current_year, 1, 1), datetime(current_year + 1, 1, 1), False
+
+    if period_count(start.date(), end.date(), granularity) > MAX_TIMESERIES_BUCKETS:
+        raise ValueError(f"Too many buckets, at most {MAX_TIMESERIES_BUCKETS} are allowed")
+    return start, end, filtered
+
+
+# First day with any disasters, from the rollups (None if there are none)
+def first_disaster_day():
+    day = db.session.execute(select(func.min(DisasterDailyRollup.day))).scalar()
+    return datetime.combine(day, datetime.min.time()) if day else None
+
+
+# Join conditions limiting rollup rows to a [start, end) window
+def rollup_period(start=None, end=None):
+    conditions = []
+    if start:
+        conditions.append(DisasterDailyRollup.day >= start.date())
+    if end:
+        conditions.append(DisasterDailyRollup.day < end.date())
+    return conditions
+
+
+# Disaster counts per type from the rollups, including types with no events
+def count_disasters_by_type(start=None, end=None):
+    rows = db.session.execute(
+        select(DisasterType.name, func.coalesce(func.sum(DisasterDailyRollup.disaster_count), 0))
+        .outerjoin(DisasterDailyRollup, db.and_(
+            DisasterDailyRollup.disaster_type_id == DisasterType.id, *rollup_period(start, end)
+        ))
+        .group_by(DisasterType.id, DisasterType.name)
+    ).all()
+    return {name: count for name, count in rows}
+
+
+# Total, active and alert counts in a single statement
+def headline_totals():
+    totals = db.session.execute(
+        select(
+            select(func.count(Disaster.id)).scalar_subquery(),
+            select(func.count(Disaster.id)).where(Disaster.is_active == True).scalar_subquery(),
+            select(func.count(DisasterAlert.id)).where(DisasterAlert.is_active == True).scalar_subquery()
+        )
+    ).one()
+    return {
+        'total_disasters': totals[0],
+        'active_disasters': totals[1],
+        'active_alerts': totals[2]
+    }
+
+
+# Compute every bucket needed by the charts with a handful of GROUP BY queries
+def compute_statistics(start, end, filtered):
+    """
+    Build the /api/statistics payload for a period from resolve_period.
+
+    Each section is answered by a single grouped query over the daily
+    rollup table, so the cost depends on the number of buckets reported
+    rather than on the number of disaster events.
+    """
+    # Type and state breakdowns cover all time unless a period was requested
+    period_start, period_end = (start, end) if filtered else (None, None)
+
+    # Disasters by type (outer join keeps types with no events)
+    disasters_by_type = count_disasters_by_type(period_start, period_end)
+
+    # Disasters by state
+    state_rows = db.session.execute(
+        select(State.name, func.coalesce(func.sum(DisasterDailyRollup.disaster_count), 0))
+        .outerjoin(DisasterDailyRollup, db.and_(
+            DisasterDailyRollup.state_id == State.id, *rollup_period(period_start, period_end)
+        ))
+        .group_by(State.id, State.name)
+    ).all()
+    disasters_by_state = {name: count for name, count in state_rows}
+
+    # Disasters by month within the window
+    month_series = rollup_series(start, end, 'month')
+    single_year = len({bucket.year for bucket in month_series}) == 1
+    label_format = '%b' if single_year else '%b %Y'
+    disasters_by_month = {}
+    for bucket, (count, _) in month_series.items():
+        disasters_by_month[bucket.strftime(label_format)] = count
+
+    # Risk assessment distribution
+    risk_rows = db.session.execute(
+        select(RiskAssessment.risk_level, func.count(RiskAssessment.id))
+        .group_by(RiskAssessment.risk_level)
+    ).all()
+    risk_counts = dict(risk_rows)
+    risk_levels = {f"Level {level}": risk_counts.get(level, 0) for level in range(1, 6)}
+
+    # Headline totals in one statement
+    totals = headline_totals()
+
+    return {
+        'disasters_by_type': disasters_by_type,
+        'disasters_by_state': disasters_by_state,
+        'disasters_by_month': disasters_by_month,
+        'risk_levels': risk_levels,
+        'total_disasters': totals['total_disasters'],
+        'active_disasters': totals['active_disasters'],
+        'active_alerts': totals['active_alerts']
+    }
@@ -0,0 +1,276 @@
+import os
+import queue
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert, select, delete, func, inspect
+from sqlalchemy.orm import Session
+from app import app, db
+from models import DisasterAlert, AlertEvent
+from projections import alert_projection, serialize_alert
+from versioning import current_data_version
+
+logger = logging.getLogger(__name__)
+
+# How often each worker's poller looks for new alert events
+ALERT_STREAM_POLL_SECONDS = float(os.environ.get("ALERT_STREAM_POLL_SECONDS", 1))
+
+# Comment line sent to idle clients so dead connections are noticed
+ALERT_STREAM_HEARTBEAT_SECONDS = 15
+
+# Reconnect delay suggested to EventSource clients
+ALERT_STREAM_RETRY_MS = 5000
+
+# Recent events kept in memory so reconnecting clients resume without a query
+ALERT_STREAM_BUFFER_SIZE = 1000
+
+# Events a slow client may fall behind before it is disconnected
+ALERT_STREAM_QUEUE_SIZE = 256
+
+# Stream clients one worker serves at a time. Each open stream holds one
+# of the worker's gunicorn threads, so keep this below --threads to leave
+# threads for ordinary requests.
+ALERT_STREAM_MAX_CLIENTS = int(os.environ.get("ALERT_STREAM_MAX_CLIENTS", 24))
+
+# Most events replayed to a client resuming from an old Last-Event-ID
+ALERT_STREAM_MAX_BACKLOG = 1000
+
+# How long alert events are kept for resuming clients
+ALERT_EVENT_RETENTION_DAYS = int(os.environ.get("ALERT_EVENT_RETENTION_DAYS", 7))
+
+
+# Append alert events to the change sequence within the session's transaction
+def record_alert_events(session, alert_ids, kind):
+    if not alert_ids:
+        return
+    now = datetime.utcnow()
+    # Core insert, so recording events never triggers another flush
+    session.connection().execute(
+        insert(AlertEvent.__table__),
+        [{'alert_id': alert_id, 'event': kind, 'created_at': now} for alert_id in alert_ids]
+    )
+
+
+def _alert_event_kind(alert):
+    # An update that switches the alert off is reported as an expiry
+    history = inspect(alert).attrs.is_active.history
+    if history.added and not history.added[0] and history.deleted and history.deleted[0]:
+        return 'expired'
+    return 'updated'
+
+
+# Record events for alerts inserted or modified through the unit of work
+@event.listens_for(Session, 'after_flush')
+def _track_alert_changes(session, flush_context):
+    # new and dirty still hold their pre-flush contents here, with ids assigned
+    events = {'created': [], 'updated': [], 'expired': []}
+    for obj in session.new:
+        if isinstance(obj, DisasterAlert):
+            events['created'].append(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, DisasterAlert) and session.is_modified(obj, include_collections=False):
+            events[_alert_event_kind(obj)].append(obj.id)
+
+    for kind, alert_ids in events.items():
+        record_alert_events(session, alert_ids, kind)
+
+
+# Load alert events after a sequence id, joined to the current alert data
+def fetch_alert_events(after_id, until_id=None, limit=ALERT_STREAM_MAX_BACKLOG):
+    query = (
+        alert_projection(active_only=False)
+        .add_columns(AlertEvent.id.label('event_id'), AlertEvent.event)
+        .join(AlertEvent, AlertEvent.alert_id == DisasterAlert.id)
+        .where(AlertEvent.id > after_id)
+        .order_by(None)
+        .order_by(AlertEvent.id)
+        .limit(limit)
+    )
+    if until_id is not None:
+        query = query.where(AlertEvent.id <= until_id)
+
+    return [{
+        'id': row.event_id,
+        'event': row.event,
+        'alert': serialize_alert(row)
+    } for row in db.session.execute(query)]
+
+
+# Highest event id in the change sequence
+def latest_alert_event_id():
+    return db.session.execute(select(func.max(AlertEvent.id))).scalar() or 0
+
+
+# Delete alert events older than the retention period
+def prune_alert_events():
+    cutoff = datetime.utcnow() - timedelta(days=ALERT_EVENT_RETENTION_DAYS)
+    with app.app_context():
+        try:
+            result = db.session.execute(delete(AlertEvent).where(AlertEvent.created_at < cutoff))
+            db.session.commit()
+            if result.rowcount:
+                logger.info(f"Pruned {result.rowcount} alert events")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error pruning alert events: {str(e)}")
+
+
+class _Subscriber:
+    """One connected stream client"""
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=ALERT_STREAM_QUEUE_SIZE)
+        self.dropped = False
+
+
+class AlertEventBroker:
+    """
+    Per-worker fan-out of alert events to connected stream clients.
+
+    A single poller thread reads new rows from the alert_event table and
+    hands them to every subscriber's queue, so the database sees one
+    small query per worker instead of one per client. It only queries
+    when the data version has moved, since every alert change bumps it.
+    Clients that fall too far behind are dropped and resume from their
+    Last-Event-ID on reconnect.
+    """
+
+    def __init__(self, poll_interval=ALERT_STREAM_POLL_SECONDS, buffer_size=ALERT_STREAM_BUFFER_SIZE,
+                 max_clients=ALERT_STREAM_MAX_CLIENTS):
+        self.poll_interval = poll_interval
+        self.max_clients = max_clients
+        self._subscribers = set()
+        self._recent = deque(maxlen=buffer_size)
+        self._last_id = None
+        self._last_version = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, last_event_id=None):
+        """
+        Register a client.
+
+        Returns:
+            Tuple of (subscriber, backlog) where backlog holds the events
+            after last_event_id that the client has not seen yet, or
+            (None, []) if this worker already serves max_clients streams
+        """
+        subscriber = _Subscriber()
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None, []
+            if not self._subscribers:
+                # Nobody was listening, so the poller position may be stale
+                with app.app_context():
+                    self._last_id = latest_alert_event_id()
+                    self._last_version = current_data_version()[0]
+                self._recent.clear()
+            self._subscribers.add(subscriber)
+            self._ensure_poller()
+            until_id = self._last_id
+
+            if last_event_id is None or last_event_id >= until_id:
+                return subscriber, []
+            if self._recent and self._recent[0]['id'] <= last_event_id + 1:
+                return subscriber, [e for e in self._recent if e['id'] > last_event_id]
+
+        # Older than the in-memory buffer: read the gap from the database.
+        # Events after until_id are already going to the subscriber's queue.
+        with app.app_context():
+            return subscriber, fetch_alert_events(last_event_id, until_id)
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _ensure_poller(self):
+        # Caller holds the lock
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='alert-stream-poller', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            if not self._subscribers:
+                continue
+            try:
+                with app.app_context():
+                    self.poll()
+            except Exception as e:
+                logger.error(f"Error polling alert events: {str(e)}")
+
+    def poll(self):
+        version = current_data_version()[0]
+        if version == self._last_version:
+            return
+        events = fetch_alert_events(self._last_id or 0)
+        with self._lock:
+            # A full page means there may be more; check again next time
+            if len(events) < ALERT_STREAM_MAX_BACKLOG:
+                self._last_version = version
+            events = [e for e in events if e['id'] > (self._last_id or 0)]
+            if events:
+                self._last_id = events[-1]['id']
+                self._recent.extend(events)
+                self._publish(events)
+
+    def _publish(self, events):
+        # Caller holds the lock
+        for subscriber in list(self._subscribers):
+            try:
+                for item in events:
+                    subscriber.queue.put_nowait(item)
+                    self.delivered += 1
+            except queue.Full:
+                subscriber.dropped = True
+                self._subscribers.discard(subscriber)
+                self.dropped += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'max_clients': self.max_clients,
+                'last_event_id': self._last_id,
+                'buffered': len(self._recent),
+                'delivered': self.delivered,
+                'dropped': self.dropped,
+                'pid': os.getpid()
+            }
+
+
+alert_broker = AlertEventBroker()
+
+
+# Format one event in the text/event-stream wire format
+def format_sse(item):
+    return f"id: {item['id']}\nevent: alert.{item['event']}\ndata: {app.json.dumps(item['alert'])}\n\n"
+
+
+# Stream events to one subscriber until it disconnects or falls behind
+def sse_stream(subscriber, backlog):
+    try:
+        # Tell EventSource how long to wait before reconnecting
+        yield f"retry: {ALERT_STREAM_RETRY_MS}\n\n"
+        last_id = 0
+        for item in backlog:
+            last_id = item['id']
+            yield format_sse(item)
+
+        while not subscriber.dropped:
+            try:
+                item = subscriber.queue.get(timeout=ALERT_STREAM_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            # Skip anything already sent as part of the backlog
+            if item['id'] > last_id:
+                last_id = item['id']
+                yield format_sse(item)
+    finally:
+        alert_broker.unsubscribe(subscriber)
@@ -0,0 +1,78 @@
+import os
+import logging
+from datetime import datetime
+from sqlalchemy import update, select, or_, and_
+from app import app, db
+from models import Disaster, DisasterAlert
+from alert_events import record_alert_events, prune_alert_events
+
+logger = logging.getLogger(__name__)
+
+# How often the alert expiry sweep runs
+ALERT_EXPIRY_INTERVAL_MINUTES = int(os.environ.get("ALERT_EXPIRY_INTERVAL_MINUTES", 5))
+
+
+# Deactivate every alert that has expired or whose disaster has ended
+def expire_alerts():
+    """
+    Expire alerts in bulk with a single UPDATE, so pages that list
+    alerts never have to write. Expired alert ids are returned by the
+    UPDATE itself and recorded as alert stream events.
+
+    Returns:
+        Number of alerts deactivated
+    """
+    now = datetime.utcnow()
+    with app.app_context():
+        try:
+            expired_ids = db.session.execute(
+                update(DisasterAlert)
+                .where(DisasterAlert.is_active == True)
+                .where(or_(
+                    and_(DisasterAlert.expires_at.isnot(None), DisasterAlert.expires_at <= now),
+                    DisasterAlert.disaster_id.in_(
+                        select(Disaster.id).where(Disaster.is_active == False)
+                    )
+                ))
+                .values(is_active=False)
+                .returning(DisasterAlert.id),
+                execution_options={'synchronize_session': False}
+            ).scalars().all()
+            expired = len(expired_ids)
+
+            if expired:
+                # Publish the expiries to the alert stream in the same transaction
+                record_alert_events(db.session, expired_ids, 'expired')
+                db.session.commit()
+                logger.info(f"Expired {expired} alerts")
+            else:
+                # Nothing changed, so don't move the data version on
+                db.session.rollback()
+            return expired
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error expiring alerts: {str(e)}")
+            return 0
+
+
+# Setup the scheduled alert expiry sweep
+def setup_alert_lifecycle(scheduler):
+    scheduler.add_job(
+        expire_alerts,
+        'interval',
+        minutes=ALERT_EXPIRY_INTERVAL_MINUTES,
+        id='alert_expiry_job',
+        next_run_time=datetime.now(),
+        replace_existing=True
+    )
+
+    # Alert stream events are only needed for a while by reconnecting clients
+    scheduler.add_job(
+        prune_alert_events,
+        'interval',
+        hours=24,
+        id='alert_event_prune_job',
+        replace_existing=True
+    )
+
+    logger.info(f"Scheduled alert expiry every {ALERT_EXPIRY_INTERVAL_MINUTES} minutes")
@@ -1,16 +1,22 @@
 import os
+import time
 import logging
 
+# Measured from here to the end of this module: the worker cold start
+_startup_began = time.perf_counter()
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
-from apscheduler.schedulers.background import BackgroundScheduler
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Cold start budget for a web worker; slower starts are logged as warnings
+STARTUP_TARGET_SECONDS = float(os.environ.get("STARTUP_TARGET_SECONDS", 2.0))
+
 class Base(DeclarativeBase):
     pass
 
@@ -32,9 +38,6 @@ app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 # Initialize the app with the extension
 db.init_app(app)
 
-# Create a scheduler for background data updates
-scheduler = BackgroundScheduler()
-
 with app.app_context():
     # Import the models here for table creation
     import models  # noqa: F401
@@ -42,14 +45,27 @@ with app.app_context():
     # Create all tables
     db.create_all()
     
-    # Import and start data collection (only if not already running)
-    from data_collection import setup_data_collection, initialize_reference_data
+    # Bring tables created by older versions up to date (columns, indexes)
+    from migrations import run_migrations
+    run_migrations()
+    
+    # Seed the data version counter used for ETags and cache invalidation
+    from versioning import ensure_data_version_row
+    ensure_data_version_row()
+    
+    # Build the daily rollups used by the statistics if they are missing
+    from rollups import ensure_rollups
+    ensure_rollups()
     
     # Initialize reference data (disaster types and states)
+    from reference_data import initialize_reference_data
     initialize_reference_data()
     
-    # Setup scheduled data collection (runs every 6 hours)
-    if not scheduler.running:
-        setup_data_collection(scheduler)
-        scheduler.start()
-        logger.info("Started background data collection scheduler")
+    # Data collection and the other scheduled jobs run in the collector
+    # process (collector.py), not in the web workers
+
+startup_seconds = time.perf_counter() - _startup_began
+if startup_seconds > STARTUP_TARGET_SECONDS:
+    logger.warning(f"App startup took {startup_seconds:.2f}s, over the {STARTUP_TARGET_SECONDS:.1f}s target")
+else:
+    logger.info(f"App startup took {startup_seconds:.2f}s")
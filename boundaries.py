@@ -0,0 +1,167 @@
+import os
+import json
+import logging
+import threading
+import numpy as np
+from sklearn.neighbors import KDTree
+from geo import EARTH_RADIUS_KM
+
+logger = logging.getLogger(__name__)
+
+# Simplified state boundary polygons shipped with the project
+STATE_BOUNDARIES_PATH = os.environ.get(
+    "STATE_BOUNDARIES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'malaysia_states.geojson')
+)
+
+# Size (degrees) of the uniform grid cells polygons are indexed by
+STATE_GRID_CELL_DEGREES = 0.25
+
+# Points further than this from every state are left unassigned
+MAX_STATE_SNAP_KM = float(os.environ.get("MAX_STATE_SNAP_KM", 200))
+
+# Spacing (degrees, about 2 km) of the boundary points used for snapping
+STATE_SNAP_SPACING_DEGREES = 0.02
+
+
+class StateBoundaryIndex:
+    """
+    Resolve coordinates to state names from simplified boundary polygons.
+
+    Polygon rings are registered in a uniform grid; a batch of points is
+    prefiltered per ring with vectorized cell and bounding-box tests, and
+    only the surviving points go through a vectorized ray-casting test.
+    Rings are tested smallest first so enclaves (Kuala Lumpur, Putrajaya)
+    win over the state around them. Points outside every polygon, such
+    as offshore events, snap to the state owning the nearest point of a
+    densified boundary, found with a KD-tree over unit-sphere vectors.
+    """
+
+    def __init__(self, features, cell_size=STATE_GRID_CELL_DEGREES):
+        self.cell_size = cell_size
+        rings = []
+        for name, polygons in features:
+            for polygon in polygons:
+                # Only outer rings: the simplified boundaries have no holes
+                ring = np.asarray(polygon[0], dtype=float)
+                rings.append((self._area(ring), name, ring))
+        rings.sort(key=lambda item: item[0])
+
+        self.names = [name for _, name, _ in rings]
+        self.rings = [ring for _, _, ring in rings]
+        self.bboxes = np.array([[r[:, 0].min(), r[:, 1].min(), r[:, 0].max(), r[:, 1].max()] for r in self.rings])
+
+        # Grid cell -> rings whose bounding box overlaps it
+        self.grid = {}
+        for index, (min_lon, min_lat, max_lon, max_lat) in enumerate(self.bboxes):
+            for cx in range(self._cell(min_lon), self._cell(max_lon) + 1):
+                for cy in range(self._cell(min_lat), self._cell(max_lat) + 1):
+                    self.grid.setdefault((cx, cy), []).append(index)
+        self.ring_cells = [
+            np.array([cx * 100000 + cy for (cx, cy), members in self.grid.items() if index in members])
+            for index in range(len(self.rings))
+        ]
+
+        # Boundary points every STATE_SNAP_SPACING_DEGREES, for snapping
+        # points that fall outside all rings to the nearest state
+        points, owners = [], []
+        for index, ring in enumerate(self.rings):
+            for start, end in zip(ring[:-1], ring[1:]):
+                steps = max(1, int(np.ceil(np.hypot(*(end - start)) / STATE_SNAP_SPACING_DEGREES)))
+                fractions = np.arange(steps)[:, None] / steps
+                points.append(start + fractions * (end - start))
+                owners.append(np.full(steps, index))
+        points = np.concatenate(points)
+        self.boundary_owners = np.concatenate(owners)
+        self.boundary_tree = KDTree(self._unit_vectors(points[:, 1], points[:, 0]))
+
+    @staticmethod
+    def _area(ring):
+        x, y = ring[:, 0], ring[:, 1]
+        return abs(np.dot(x, np.roll(y, 1)) - np.dot(y, np.roll(x, 1))) / 2
+
+    def _cell(self, value):
+        return int(np.floor(value / self.cell_size))
+
+    @staticmethod
+    def _contains(ring, lons, lats):
+        # Even-odd ray casting for many points against one ring
+        x1, y1 = ring[:-1, 0], ring[:-1, 1]
+        x2, y2 = ring[1:, 0], ring[1:, 1]
+        px, py = lons[:, None], lats[:, None]
+        crosses = (y1 > py) != (y2 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_at = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        return np.count_nonzero(crosses & (px < x_at), axis=1) % 2 == 1
+
+    @staticmethod
+    def _unit_vectors(lats, lons):
+        lat, lon = np.radians(lats), np.radians(lons)
+        return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+    def _snap(self, lons, lats):
+        # Nearest boundary point by chord length, converted to km along the surface
+        chord, nearest = self.boundary_tree.query(self._unit_vectors(lats, lons), k=1)
+        km = 2 * np.arcsin(np.minimum(chord[:, 0] / 2, 1.0)) * EARTH_RADIUS_KM
+        return self.boundary_owners[nearest[:, 0]], km
+
+    def locate(self, lats, lons):
+        """
+        Args:
+            lats, lons: Sequences of coordinates
+
+        Returns:
+            List of state names (None where a point is further than
+            MAX_STATE_SNAP_KM from every state or has no coordinates)
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        result = np.full(len(lats), -1)
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+
+        cells = np.floor(lons / self.cell_size) * 100000 + np.floor(lats / self.cell_size)
+        for index, ring in enumerate(self.rings):
+            min_lon, min_lat, max_lon, max_lat = self.bboxes[index]
+            candidates = np.flatnonzero(
+                valid & (result < 0)
+                & np.isin(cells, self.ring_cells[index])
+                & (lons >= min_lon) & (lons <= max_lon) & (lats >= min_lat) & (lats <= max_lat)
+            )
+            if len(candidates):
+                inside = self._contains(ring, lons[candidates], lats[candidates])
+                result[candidates[inside]] = index
+
+        outside = np.flatnonzero(valid & (result < 0))
+        if len(outside):
+            owners, km = self._snap(lons[outside], lats[outside])
+            close = km <= MAX_STATE_SNAP_KM
+            result[outside[close]] = owners[close]
+
+        return [self.names[index] if index >= 0 else None for index in result]
+
+
+# Read (name, polygons) pairs from a GeoJSON feature collection
+def load_state_features(path=STATE_BOUNDARIES_PATH):
+    with open(path) as f:
+        collection = json.load(f)
+    features = []
+    for feature in collection['features']:
+        geometry = feature['geometry']
+        polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+        features.append((feature['properties']['name'], polygons))
+    return features
+
+
+_state_index = None
+_state_index_lock = threading.Lock()
+
+
+# Shared index, built on first use
+def get_state_index():
+    global _state_index
+    if _state_index is None:
+        with _state_index_lock:
+            if _state_index is None:
+                _state_index = StateBoundaryIndex(load_state_features())
+                logger.info(f"Loaded {len(_state_index.rings)} state boundary polygons")
+    return _state_index
@@ -0,0 +1,162 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request
+from app import app
+from versioning import current_data_version
+from singleflight import SingleFlight
+from streaming import is_streaming_request
+
+logger = logging.getLogger(__name__)
+
+# Bounds for each worker's result cache
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 512))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Response headers worth replaying from a cached entry
+CACHED_HEADERS = ('X-Next-Cursor', 'Link')
+
+
+class ResultCache:
+    """
+    LRU cache of serialized API responses, bounded by entry count and bytes.
+
+    Every entry belongs to the data version it was computed under. When a
+    lookup sees a newer version (bumped by any process writing to the
+    database) the whole cache is dropped, so all workers discard stale
+    results within one version-cache TTL of each other.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _sync_version(self, version):
+        # Caller holds the lock
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._sync_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, version, entry, size):
+        # Skip results that would take a large share of the whole budget
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            self._sync_version(version)
+            if version != self._version:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous['size']
+            entry['size'] = size
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted['size']
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'data_version': self._version,
+                'pid': os.getpid()
+            }
+
+
+result_cache = ResultCache(RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES)
+
+# Concurrent cache misses for the same key share one computation
+response_flight = SingleFlight('api-responses')
+
+
+# Cache key from the endpoint and its normalized filter arguments
+def make_cache_key(arg_types):
+    # Parse each argument exactly as the view does, so equivalent requests
+    # share an entry and unrelated parameters (cache busters) are ignored
+    args = tuple((name, request.args.get(name, type=arg_type)) for name, arg_type in sorted(arg_types.items()))
+    return (request.endpoint, args)
+
+
+# Decorator caching a JSON view's successful responses
+def cached_response(**arg_types):
+    """
+    Cache a view's 200 responses keyed on the endpoint plus the listed
+    query arguments (name=type). Every argument the view reads must be
+    listed, otherwise different requests would share an entry.
+
+    Misses are coalesced: while one request computes a key, identical
+    requests in the same worker wait and reuse its response.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Streamed responses are produced incrementally and never buffered
+            if is_streaming_request():
+                return view(*args, **kwargs)
+
+            key = make_cache_key(arg_types)
+            version = current_data_version()[0]
+
+            entry = result_cache.get(key, version)
+            if entry is None:
+                # On a miss, identical concurrent requests wait for one computation
+                entry = response_flight.do((key, version), lambda: compute(args, kwargs, key, version))
+            return app.response_class(entry['body'], status=entry['status'], mimetype=entry['mimetype'],
+                                      headers=entry['headers'])
+
+        def compute(args, kwargs, key, version):
+            response = app.make_response(view(*args, **kwargs))
+            body = response.get_data()
+            headers = [(name, response.headers[name]) for name in CACHED_HEADERS if name in response.headers]
+            entry = {
+                'body': body,
+                'status': response.status_code,
+                'mimetype': response.mimetype,
+                'headers': headers
+            }
+            if response.status_code == 200:
+                result_cache.set(key, version, entry, len(body))
+            return entry
+
+        return wrapper
+    return decorator
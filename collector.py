@@ -0,0 +1,173 @@
+import os
+import time
+import socket
+import signal
+import logging
+import threading
+from datetime import datetime, timedelta
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from sqlalchemy import update, case, or_
+from sqlalchemy.exc import IntegrityError
+from app import app, db
+from models import CollectorLease
+from data_collection import setup_data_collection
+from alert_lifecycle import setup_alert_lifecycle
+
+logger = logging.getLogger(__name__)
+
+# Lease that elects the one process running the scheduled jobs
+COLLECTOR_LEASE_NAME = 'data-collection'
+
+# How long a lease lasts without renewal, and how often the holder renews it.
+# A collector that dies is replaced by a standby after at most the lease time.
+COLLECTOR_LEASE_SECONDS = int(os.environ.get("COLLECTOR_LEASE_SECONDS", 90))
+COLLECTOR_RENEW_SECONDS = COLLECTOR_LEASE_SECONDS / 3
+
+# A run missed while no collector was up still starts if it is at most this
+# late; several missed runs of a job are coalesced into one
+COLLECTOR_MISFIRE_GRACE_SECONDS = int(os.environ.get("COLLECTOR_MISFIRE_GRACE_SECONDS", 60 * 60))
+
+
+class LeaderLease:
+    """
+    Database-backed lease shared by every collector process.
+
+    try_acquire() takes the lease if it is free or expired, or extends it
+    if this process already holds it, with a single conditional UPDATE
+    (or the first INSERT), so two processes can never both succeed.
+    Expiry uses each host's clock; hosts are assumed to run NTP.
+    """
+
+    def __init__(self, name=COLLECTOR_LEASE_NAME, holder=None, ttl=COLLECTOR_LEASE_SECONDS):
+        self.name = name
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+        self.ttl = ttl
+
+    def try_acquire(self):
+        now = datetime.utcnow()
+        with app.app_context():
+            try:
+                result = db.session.execute(
+                    update(CollectorLease)
+                    .where(CollectorLease.name == self.name,
+                           or_(CollectorLease.holder == self.holder, CollectorLease.expires_at < now))
+                    .values(holder=self.holder,
+                            acquired_at=case((CollectorLease.holder == self.holder, CollectorLease.acquired_at),
+                                             else_=now),
+                            expires_at=now + timedelta(seconds=self.ttl)),
+                    execution_options={'synchronize_session': False}
+                )
+                if result.rowcount == 1:
+                    db.session.commit()
+                    return True
+
+                # Nobody has taken it yet
+                db.session.add(CollectorLease(name=self.name, holder=self.holder, acquired_at=now,
+                                              expires_at=now + timedelta(seconds=self.ttl)))
+                db.session.commit()
+                return True
+            except IntegrityError:
+                # The lease exists and another live process holds it
+                db.session.rollback()
+                return False
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def release(self):
+        with app.app_context():
+            try:
+                db.session.execute(
+                    update(CollectorLease)
+                    .where(CollectorLease.name == self.name, CollectorLease.holder == self.holder)
+                    .values(expires_at=datetime.utcnow()),
+                    execution_options={'synchronize_session': False}
+                )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error releasing the {self.name} lease: {str(e)}")
+
+
+def _start_scheduler():
+    # Jobs live in the database, so their schedule survives restarts and failovers
+    with app.app_context():
+        jobstore = SQLAlchemyJobStore(engine=db.engine, tablename='apscheduler_jobs')
+    scheduler = BackgroundScheduler(
+        jobstores={'default': jobstore},
+        job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': COLLECTOR_MISFIRE_GRACE_SECONDS}
+    )
+    
+    # Start paused to read the stored schedule before the jobs are re-registered
+    scheduler.start(paused=True)
+    stored = {job.id: job.next_run_time for job in scheduler.get_jobs()}
+    
+    setup_data_collection(scheduler)
+    # Expire stale alerts in the background rather than on page views
+    setup_alert_lifecycle(scheduler)
+    
+    # Re-registering resets next run times; keep the stored ones (a time that
+    # passed while no collector was running is handled as a misfire)
+    for job in scheduler.get_jobs():
+        if stored.get(job.id):
+            job.modify(next_run_time=stored[job.id])
+    
+    scheduler.resume()
+    logger.info("Started background data collection scheduler")
+    return scheduler
+
+
+# Run the scheduled jobs while this process holds the collector lease
+def run_collector(stop_event=None):
+    """
+    Standby until the lease is free, then run the scheduler and keep
+    renewing the lease. If renewal fails for longer than the lease lasts
+    (another process may have taken over), the scheduler is stopped and
+    the process goes back to standby. Returns when stop_event is set.
+    """
+    stop_event = stop_event or threading.Event()
+    lease = LeaderLease()
+    scheduler = None
+    renewed_at = None
+    logger.info(f"Collector {lease.holder} started")
+
+    try:
+        while not stop_event.is_set():
+            try:
+                held = lease.try_acquire()
+            except Exception as e:
+                logger.error(f"Error renewing the collector lease: {str(e)}")
+                held = None
+
+            if held:
+                renewed_at = time.monotonic()
+                if scheduler is None:
+                    logger.info(f"Collector {lease.holder} acquired the lease")
+                    scheduler = _start_scheduler()
+            elif scheduler is not None and (held is False or time.monotonic() - renewed_at > lease.ttl):
+                logger.warning(f"Collector {lease.holder} lost the lease, stopping scheduled jobs")
+                scheduler.shutdown(wait=False)
+                scheduler = None
+
+            stop_event.wait(COLLECTOR_RENEW_SECONDS)
+    finally:
+        if scheduler is not None:
+            scheduler.shutdown(wait=False)
+            lease.release()
+
+
+# Run the collector on a daemon thread of this process (single-process development setups)
+def start_embedded_collector():
+    thread = threading.Thread(target=run_collector, name='collector', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        run_collector(stop)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,104 @@
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import select
+from app import app, db
+from models import Disaster, DisasterType, State, RiskAssessment
+from aggregates import count_disasters_by_type, headline_totals
+from versioning import current_data_version
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+# Requests that find the snapshot stale at the same time share one rebuild
+_rebuild_flight = SingleFlight('dashboard-snapshot')
+
+
+# Build the dashboard snapshot from the database
+def build_dashboard_snapshot():
+    """
+    Precompute everything the home page needs as plain Python values,
+    so rendering it does not touch the database.
+    """
+    # Read the version first: if data changes while building, the snapshot
+    # is labelled with the older version and rebuilt on the next request
+    data_version = current_data_version()[0]
+    totals = headline_totals()
+    disasters_by_type = count_disasters_by_type()
+
+    # Recent disasters with type and state names joined in
+    recent_rows = db.session.execute(
+        select(
+            Disaster.id, Disaster.title, Disaster.severity, Disaster.start_date,
+            DisasterType.name, State.name
+        )
+        .join(DisasterType, Disaster.disaster_type_id == DisasterType.id)
+        .join(State, Disaster.state_id == State.id)
+        .order_by(Disaster.start_date.desc())
+        .limit(5)
+    ).all()
+    recent_disasters = [{
+        'id': row[0],
+        'title': row[1],
+        'severity': row[2],
+        'start_date': row[3],
+        'type': row[4],
+        'state': row[5]
+    } for row in recent_rows]
+
+    # High risk areas
+    risk_rows = db.session.execute(
+        select(
+            RiskAssessment.id, RiskAssessment.location_name, RiskAssessment.risk_level,
+            RiskAssessment.last_assessed, DisasterType.name, State.name
+        )
+        .join(DisasterType, RiskAssessment.disaster_type_id == DisasterType.id)
+        .join(State, RiskAssessment.state_id == State.id)
+        .filter(RiskAssessment.risk_level >= 4)
+        .limit(5)
+    ).all()
+    high_risk_areas = [{
+        'id': row[0],
+        'location_name': row[1],
+        'risk_level': row[2],
+        'last_assessed': row[3],
+        'disaster_type': row[4],
+        'state': row[5]
+    } for row in risk_rows]
+
+    return {
+        'total_disasters': totals['total_disasters'],
+        'active_disasters': totals['active_disasters'],
+        'alerts': totals['active_alerts'],
+        'disasters_by_type': disasters_by_type,
+        'recent_disasters': recent_disasters,
+        'high_risk_areas': high_risk_areas,
+        'data_version': data_version,
+        'built_at': datetime.utcnow()
+    }
+
+
+# Rebuild the snapshot held by this worker
+def refresh_dashboard_snapshot():
+    global _snapshot
+    with app.app_context():
+        snapshot = build_dashboard_snapshot()
+    with _snapshot_lock:
+        _snapshot = snapshot
+    logger.debug("Dashboard snapshot refreshed")
+    return snapshot
+
+
+# Return the current snapshot, rebuilding it only when the data version moved on
+def get_dashboard_snapshot():
+    """
+    Workers that did not run the ingest notice new data through the
+    (cached) data version counter rather than by re-querying the tables.
+    """
+    snapshot = _snapshot
+    if snapshot is None or snapshot['data_version'] != current_data_version()[0]:
+        snapshot = _rebuild_flight.do('snapshot', refresh_dashboard_snapshot)
+    return snapshot
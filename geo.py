@@ -0,0 +1,212 @@
+import os
+from sqlalchemy import select, func, cast, or_, and_, Integer
+from app import db
+from geohash_codec import GEOHASH_PRECISION, GEOHASH_ALPHABET, encode_geohash
+
+# Zoom level from which individual features are returned instead of clusters
+CLUSTER_MAX_ZOOM = int(os.environ.get("MAP_CLUSTER_MAX_ZOOM", 10))
+
+# Number of grid cells across one 256px map tile when clustering (~64px cells)
+CLUSTER_CELLS_PER_TILE = 4
+
+# Upper bound on individual features returned for one viewport
+MAX_VIEWPORT_FEATURES = int(os.environ.get("MAP_MAX_VIEWPORT_FEATURES", 5000))
+
+# Maximum number of geohash cells used to cover a bounding box in a query
+GEOHASH_MAX_COVER_CELLS = 16
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+# Parse a "min_lon,min_lat,max_lon,max_lat" bounding box (Leaflet's toBBoxString)
+def parse_bbox(value):
+    """
+    Parse and validate a bounding box string.
+
+    Returns:
+        Tuple of (min_lon, min_lat, max_lon, max_lat)
+
+    Raises:
+        ValueError: if the value is malformed
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = [float(part) for part in value.split(',')]
+    except (AttributeError, ValueError):
+        raise ValueError("Invalid 'bbox', expected min_lon,min_lat,max_lon,max_lat")
+
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("Invalid 'bbox', minimum values must not exceed maximum values")
+
+    # Clamp to valid coordinates (the map may report bounds past the poles/antimeridian)
+    return (max(min_lon, -180.0), max(min_lat, -90.0), min(max_lon, 180.0), min(max_lat, 90.0))
+
+
+# Cell size (lat_degrees, lon_degrees) of a geohash precision
+def geohash_cell_size(precision):
+    bits = precision * 5
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+# Geohash cells of one precision covering a bounding box
+def _cover_cells(bbox, precision):
+    min_lon, min_lat, max_lon, max_lat = bbox
+    cell_lat, cell_lon = geohash_cell_size(precision)
+    rows = range(int((min_lat + 90.0) // cell_lat), int((max_lat + 90.0) // cell_lat) + 1)
+    cols = range(int((min_lon + 180.0) // cell_lon), int((max_lon + 180.0) // cell_lon) + 1)
+    if len(rows) * len(cols) > GEOHASH_MAX_COVER_CELLS:
+        return None
+
+    cells = set()
+    for i in rows:
+        for j in cols:
+            # Encode the cell centre (clamped so edge cells stay in range)
+            lat = min(-90.0 + (i + 0.5) * cell_lat, 90.0)
+            lon = min(-180.0 + (j + 0.5) * cell_lon, 180.0)
+            cells.add(encode_geohash(lat, lon, precision))
+    return cells
+
+
+# Smallest set of geohash prefixes (finest precision within the cell budget) covering a bbox
+def geohash_cover(bbox):
+    """
+    Return the geohash prefixes covering a bounding box, or None when the
+    box is so large that the prefix filter would not narrow the scan.
+    """
+    cover = None
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        cells = _cover_cells(bbox, precision)
+        if cells is None:
+            break
+        cover = cells
+    return cover
+
+
+# Next prefix in geohash order (exclusive upper bound of a prefix range)
+def _next_prefix(prefix):
+    chars = list(prefix)
+    while chars:
+        index = GEOHASH_ALPHABET.index(chars[-1])
+        if index + 1 < len(GEOHASH_ALPHABET):
+            chars[-1] = GEOHASH_ALPHABET[index + 1]
+            return ''.join(chars)
+        chars.pop()
+    return None
+
+
+# Index-friendly range conditions matching any of the geohash prefixes
+def geohash_prefix_condition(geohash_col, prefixes):
+    ranges = []
+    for prefix in sorted(prefixes):
+        upper = _next_prefix(prefix)
+        if upper is None:
+            ranges.append(geohash_col >= prefix)
+        else:
+            ranges.append(and_(geohash_col >= prefix, geohash_col < upper))
+    return or_(*ranges)
+
+
+# Conditions restricting a latitude/longitude pair to a bounding box
+def bbox_conditions(lat_col, lon_col, bbox, geohash_col=None):
+    """
+    Exact bounding-box conditions, optionally narrowed first by geohash
+    prefix ranges so the database can use the geohash index.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    conditions = []
+
+    if geohash_col is not None:
+        cover = geohash_cover(bbox)
+        if cover:
+            conditions.append(geohash_prefix_condition(geohash_col, cover))
+
+    conditions.extend([
+        lat_col >= min_lat,
+        lat_col <= max_lat,
+        lon_col >= min_lon,
+        lon_col <= max_lon
+    ])
+    return conditions
+
+
+# Grid cell size (degrees) used for clustering at a zoom level
+def cluster_cell_size(zoom):
+    return 360.0 / (2 ** max(zoom, 0)) / CLUSTER_CELLS_PER_TILE
+
+
+# Portable FLOOR() for non-negative values
+def _floor(expr):
+    # SQLite only ships FLOOR() when built with math functions; truncating
+    # a non-negative value gives the same result. PostgreSQL rounds on
+    # CAST, so it needs the real FLOOR().
+    if db.engine.dialect.name == 'sqlite':
+        return cast(expr, Integer)
+    return cast(func.floor(expr), Integer)
+
+
+# Aggregate points into grid-cell clusters inside the database
+def grid_clusters(lat_col, lon_col, value_col, conditions, cell_size):
+    """
+    Group points into square grid cells with a single GROUP BY.
+
+    Args:
+        lat_col, lon_col: Coordinate columns of the clustered model
+        value_col: Column whose maximum is reported per cluster (severity/risk)
+        conditions: Filter conditions (including the viewport)
+        cell_size: Cell size in degrees
+
+    Returns:
+        List of GeoJSON point features, one per non-empty cell
+    """
+    cell_y = _floor((lat_col + 90.0) / cell_size)
+    cell_x = _floor((lon_col + 180.0) / cell_size)
+
+    rows = db.session.execute(
+        select(
+            cell_y.label('cell_y'),
+            cell_x.label('cell_x'),
+            func.count().label('point_count'),
+            func.avg(lat_col).label('latitude'),
+            func.avg(lon_col).label('longitude'),
+            func.max(value_col).label('max_level')
+        )
+        .where(lat_col.isnot(None), lon_col.isnot(None), *conditions)
+        .group_by(cell_y, cell_x)
+    ).all()
+
+    return [
+        point_feature(row.longitude, row.latitude, {
+            'cluster': True,
+            'cluster_id': f"{row.cell_y}:{row.cell_x}",
+            'point_count': row.point_count,
+            'max_level': row.max_level
+        })
+        for row in rows
+    ]
+
+
+# Build a GeoJSON point feature
+def point_feature(lon, lat, properties):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+        'properties': properties
+    }
+
+
+# Convert a serialized API record (with latitude/longitude keys) to a feature
+def record_feature(record):
+    properties = dict(record)
+    lat = properties.pop('latitude')
+    lon = properties.pop('longitude')
+    properties['cluster'] = False
+    return point_feature(lon, lat, properties)
+
+
+# Wrap features in a GeoJSON FeatureCollection
+def feature_collection(features, **metadata):
+    collection = {'type': 'FeatureCollection', 'features': features}
+    if metadata:
+        collection['metadata'] = metadata
+    return collection
@@ -0,0 +1,47 @@
+from sqlalchemy import event
+
+# Geohash encoding, kept free of app imports so models.py can use it
+
+# Stored precision (9 chars is roughly 5m x 5m)
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+# Encode a coordinate as a geohash string
+def encode_geohash(lat, lon, precision=GEOHASH_PRECISION):
+    if lat is None or lon is None:
+        return None
+
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bit, value, even = 0, 0, True
+
+    while len(chars) < precision:
+        # Bits alternate between longitude (even) and latitude (odd)
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value = value << 1
+            rng[1] = mid
+        even = not even
+
+        bit += 1
+        if bit == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bit, value = 0, 0
+
+    return ''.join(chars)
+
+
+# Keep a model's geohash column in sync with its coordinates
+def maintain_geohash(model):
+    def _set_geohash(mapper, connection, target):
+        target.geohash = encode_geohash(target.latitude, target.longitude)
+
+    event.listen(model, 'before_insert', _set_geohash)
+    event.listen(model, 'before_update', _set_geohash)
+    return model
@@ -0,0 +1,156 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeout in seconds for calls that do not pass their own
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 30))
+
+# Kept-alive connections per host; further concurrent calls wait for a free one
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 10))
+
+# Retries of connection errors and retryable statuses, with jittered backoff
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", 3))
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_BACKOFF_JITTER = 0.5
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Responses larger than this are abandoned instead of read into memory
+HTTP_MAX_RESPONSE_BYTES = int(os.environ.get("HTTP_MAX_RESPONSE_BYTES", 20 * 1024 * 1024))
+
+# Recent call durations kept per host for the latency percentiles
+HTTP_LATENCY_SAMPLES = 200
+
+HTTP_USER_AGENT = "MalaysiaDisasterMonitor/1.0"
+
+
+class ResponseTooLarge(requests.RequestException):
+    """A response body exceeded its size limit"""
+
+
+class HostStats:
+    """Call counts and latencies of one host"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.recent = deque(maxlen=HTTP_LATENCY_SAMPLES)
+
+    def record(self, seconds, size, error):
+        self.requests += 1
+        self.errors += 1 if error else 0
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bytes += size
+        self.recent.append(seconds)
+
+    def as_dict(self):
+        recent = sorted(self.recent)
+        percentile = lambda p: round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 1) if recent else None
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'avg_ms': round(self.total_seconds / self.requests * 1000, 1) if self.requests else None,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(self.max_seconds * 1000, 1)
+        }
+
+
+class HttpClient:
+    """
+    Shared HTTP client for every outbound call.
+
+    One requests.Session keeps connections alive per host (at most
+    HTTP_POOL_MAXSIZE each), retries connection errors and retryable
+    statuses with jittered exponential backoff, applies a default
+    timeout, streams bodies so oversized responses are cut off at
+    max_bytes, and records per-host latency stats.
+    """
+
+    def __init__(self):
+        retry = Retry(
+            total=HTTP_RETRIES,
+            backoff_factor=HTTP_BACKOFF_FACTOR,
+            backoff_jitter=HTTP_BACKOFF_JITTER,
+            status_forcelist=HTTP_RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                              pool_block=True, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = HTTP_USER_AGENT
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def get(self, url, params=None, headers=None, timeout=None, max_bytes=HTTP_MAX_RESPONSE_BYTES):
+        """
+        Args:
+            url: URL to fetch
+            params, headers: As for requests.get
+            timeout: Seconds, or a (connect, read) tuple (default: the module timeouts)
+            max_bytes: Largest body accepted
+
+        Returns:
+            requests.Response with the body already read
+
+        Raises:
+            requests.RequestException on connection errors, timeouts and
+            oversized bodies; HTTP error statuses are returned, not raised
+        """
+        if timeout is None:
+            timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+        start = time.monotonic()
+        size, error = 0, True
+        try:
+            response = self.session.get(url, params=params, headers=headers, timeout=timeout, stream=True)
+            with response:
+                length = response.headers.get('Content-Length')
+                if length and length.isdigit() and int(length) > max_bytes:
+                    raise ResponseTooLarge(f"{url} is {length} bytes, over the {max_bytes} byte limit")
+
+                chunks = []
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ResponseTooLarge(f"{url} is over the {max_bytes} byte limit")
+                    chunks.append(chunk)
+                response._content = b''.join(chunks)
+
+            error = response.status_code >= 500
+            return response
+        finally:
+            self._record(urlsplit(url).hostname, time.monotonic() - start, size, error)
+
+    def _record(self, host, seconds, size, error):
+        with self._lock:
+            self._hosts.setdefault(host, HostStats()).record(seconds, size, error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hosts': {host: stats.as_dict() for host, stats in sorted(self._hosts.items())},
+                'pid': os.getpid()
+            }
+
+
+http_client = HttpClient()
@@ -0,0 +1,137 @@
+import os
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from models import Disaster
+from geohash_codec import encode_geohash
+from rollups import refresh_rollup_buckets
+
+logger = logging.getLogger(__name__)
+
+# Events written per INSERT ... ON CONFLICT statement (and per transaction)
+INGEST_CHUNK_SIZE = int(os.environ.get("INGEST_CHUNK_SIZE", 500))
+
+# Natural key of an ingested event (backed by a unique index)
+UPSERT_KEY = ('source', 'title', 'start_date')
+
+# Columns refreshed when an event is ingested again
+UPSERT_COLUMNS = ('disaster_type_id', 'description', 'latitude', 'longitude', 'severity', 'source_url')
+
+
+def _dialect_insert():
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return sqlite.insert
+    if dialect == 'postgresql':
+        return postgresql.insert
+    raise RuntimeError(f"Bulk upsert needs INSERT ... ON CONFLICT, which is only used on "
+                       f"sqlite and postgresql databases, not {dialect}")
+
+
+def _naive_utc(value):
+    # DateTime columns are stored without a zone, so compare keys the same way
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _key(record):
+    return tuple(_naive_utc(record[column]) for column in UPSERT_KEY)
+
+
+# Insert new events and update changed ones in bounded chunks
+def upsert_disasters(records, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Write disaster records with INSERT ... ON CONFLICT (source, title,
+    start_date) DO UPDATE, one statement and one transaction per chunk.
+
+    Each chunk is first compared against the stored rows with a single
+    query, so unchanged events are skipped without writing anything and
+    the counts below are exact.
+
+    Args:
+        records: Dicts with the Disaster columns, including the key columns
+        chunk_size: Records per statement
+
+    Returns:
+        Dict with inserted, updated and skipped counts and the inserted ids
+    """
+    result = {'inserted': 0, 'updated': 0, 'skipped': 0, 'inserted_ids': []}
+
+    # Later records for the same key win, earlier ones are duplicates
+    unique = {}
+    for record in records:
+        record = dict(record, start_date=_naive_utc(record['start_date']))
+        unique[_key(record)] = record
+    result['skipped'] += len(records) - len(unique)
+
+    records = list(unique.values())
+    for offset in range(0, len(records), chunk_size):
+        _upsert_chunk(records[offset:offset + chunk_size], result)
+
+    return result
+
+
+def _upsert_chunk(chunk, result):
+    # Stored state of every key in the chunk, in one query
+    key_columns = [getattr(Disaster, column) for column in UPSERT_KEY]
+    compared = [getattr(Disaster, column) for column in UPSERT_COLUMNS]
+    existing = {
+        tuple(row[:len(UPSERT_KEY)]): row
+        for row in db.session.execute(
+            select(*key_columns, *compared, Disaster.state_id)
+            .where(tuple_(*key_columns).in_([_key(record) for record in chunk]))
+        )
+    }
+
+    now = datetime.utcnow()
+    to_write, inserted_keys, buckets = [], set(), set()
+    for record in chunk:
+        key = _key(record)
+        stored = existing.get(key)
+        if stored is not None:
+            stored_values = tuple(stored[len(UPSERT_KEY):len(UPSERT_KEY) + len(UPSERT_COLUMNS)])
+            if stored_values == tuple(record.get(column) for column in UPSERT_COLUMNS):
+                result['skipped'] += 1
+                continue
+            # The row may move to another type's rollup bucket
+            buckets.add((stored.start_date, stored.disaster_type_id, stored.state_id))
+            buckets.add((record['start_date'], record['disaster_type_id'], stored.state_id))
+        else:
+            inserted_keys.add(key)
+            buckets.add((record['start_date'], record['disaster_type_id'], record['state_id']))
+
+        # Bulk statements bypass the mapper events, so fill these in here
+        to_write.append(dict(
+            record,
+            geohash=encode_geohash(record.get('latitude'), record.get('longitude')),
+            created_at=now,
+            updated_at=now
+        ))
+
+    if not to_write:
+        return
+
+    insert = _dialect_insert()
+    statement = insert(Disaster)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(UPSERT_KEY),
+        set_={column: statement.excluded[column] for column in UPSERT_COLUMNS + ('geohash', 'updated_at')}
+    ).returning(Disaster.id, *key_columns)
+
+    try:
+        rows = db.session.execute(statement, to_write).all()
+        refresh_rollup_buckets(buckets)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for row in rows:
+        if tuple(row[1:]) in inserted_keys:
+            result['inserted'] += 1
+            result['inserted_ids'].append(row[0])
+        else:
+            result['updated'] += 1
@@ -2,4 +2,8 @@ from app import app  # noqa: F401
 import routes  # noqa: F401
 
 if __name__ == "__main__":
+    # Development server: collect data in this process too (gunicorn
+    # deployments run collector.py separately)
+    from collector import start_embedded_collector
+    start_embedded_collector()
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,261 @@
+import sys
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, func, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app import app, db
+from models import Disaster, DisasterAlert, RiskAssessment, DisasterDailyRollup, SchemaMigration
+from geohash_codec import encode_geohash
+from rollups import rebuild_rollups
+from pagination import API_PAGE_SIZE, keyset_queries
+from projections import disaster_projection, alert_projection
+
+logger = logging.getLogger(__name__)
+
+# Schema changes for databases created by an older version of the app.
+# db.create_all() creates missing tables but never alters existing ones,
+# so every change to an existing table is added here as a new step with
+# the next version number. Steps must be idempotent: several workers may
+# start at once and race to apply the same step.
+
+
+# Create every non-unique index declared on the models that the database lacks
+def create_declared_indexes():
+    # Unique indexes can fail on existing duplicates, so each one is created
+    # by the migration step that first removes them
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing and not index.unique:
+                index.create(db.engine, checkfirst=True)
+                logger.info(f"Created index {index.name} on {table.name}")
+
+
+# Add and backfill the geohash column on databases created before it existed
+def ensure_geohash_columns(models, batch_size=1000):
+    """
+    db.create_all() does not alter existing tables, so add the geohash
+    column and its index in place and fill it for existing rows.
+    """
+    inspector = inspect(db.engine)
+    for model in models:
+        table = model.__tablename__
+        columns = {column['name'] for column in inspector.get_columns(table)}
+        if 'geohash' not in columns:
+            with db.engine.begin() as connection:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN geohash VARCHAR(12)"))
+                connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_geohash ON {table} (geohash)"))
+            logger.info(f"Added geohash column to {table}")
+
+        # Backfill rows that have coordinates but no geohash, in batches
+        while True:
+            rows = db.session.execute(
+                select(model.id, model.latitude, model.longitude)
+                .where(model.geohash.is_(None), model.latitude.isnot(None), model.longitude.isnot(None))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            db.session.execute(update(model), [
+                {'id': row.id, 'geohash': encode_geohash(row.latitude, row.longitude)}
+                for row in rows
+            ])
+            db.session.commit()
+            logger.info(f"Backfilled geohash for {len(rows)} {table} rows")
+
+
+def _add_geohash_columns():
+    ensure_geohash_columns([Disaster, RiskAssessment])
+
+
+def _make_ingest_key_unique():
+    # Earlier ingests could store the same event twice; keep the oldest row
+    groups = db.session.execute(
+        select(Disaster.source, Disaster.title, Disaster.start_date, func.min(Disaster.id))
+        .where(Disaster.source.isnot(None))
+        .group_by(Disaster.source, Disaster.title, Disaster.start_date)
+        .having(func.count(Disaster.id) > 1)
+    ).all()
+
+    merged = 0
+    for source, title, start_date, keep_id in groups:
+        duplicate_ids = db.session.execute(
+            select(Disaster.id).where(
+                Disaster.source == source, Disaster.title == title,
+                Disaster.start_date == start_date, Disaster.id != keep_id
+            )
+        ).scalars().all()
+        db.session.execute(
+            update(DisasterAlert).where(DisasterAlert.disaster_id.in_(duplicate_ids)).values(disaster_id=keep_id),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.execute(
+            delete(Disaster).where(Disaster.id.in_(duplicate_ids)),
+            execution_options={'synchronize_session': False}
+        )
+        merged += len(duplicate_ids)
+    db.session.commit()
+
+    if merged:
+        logger.info(f"Merged {merged} duplicate disasters")
+        rebuild_rollups()
+
+    # Replace the plain lookup index with the unique one ON CONFLICT needs
+    with db.engine.begin() as connection:
+        connection.execute(text("DROP INDEX IF EXISTS ix_disaster_source_title_start_date"))
+    unique_key = next(index for index in Disaster.__table__.indexes
+                      if index.name == 'uq_disaster_source_title_start_date')
+    unique_key.create(db.engine, checkfirst=True)
+    logger.info(f"Created index {unique_key.name} on disaster")
+
+
+def _add_id_to_active_indexes():
+    # Active-only pages order by (date, id); with id in the index PostgreSQL
+    # reads them in index order instead of sorting each date's ties
+    for table, name in (('disaster', 'ix_disaster_active_start_date'),
+                        ('disaster_alert', 'ix_disaster_alert_active_issued_at')):
+        with db.engine.begin() as connection:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        index = next(index for index in db.metadata.tables[table].indexes if index.name == name)
+        index.create(db.engine, checkfirst=True)
+        logger.info(f"Rebuilt index {name} on {table}")
+
+
+# (version, name, step) in the order they must run
+MIGRATIONS = [
+    (1, 'add geohash columns', _add_geohash_columns),
+    (2, 'add composite indexes', create_declared_indexes),
+    (3, 'make the ingest key unique', _make_ingest_key_unique),
+    (4, 'add id to the active-only page indexes', _add_id_to_active_indexes),
+]
+
+
+# Apply every migration this database has not recorded yet
+def run_migrations():
+    with app.app_context():
+        applied = set(db.session.execute(select(SchemaMigration.version)).scalars())
+        for version, name, step in MIGRATIONS:
+            if version in applied:
+                continue
+
+            logger.info(f"Applying schema migration {version}: {name}")
+            step()
+            try:
+                db.session.add(SchemaMigration(version=version, name=name, applied_at=datetime.utcnow()))
+                db.session.commit()
+            except IntegrityError:
+                # Another worker applied and recorded it first
+                db.session.rollback()
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN wrapper for a select() statement"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = 'EXPLAIN QUERY PLAN ' if compiler.dialect.name == 'sqlite' else 'EXPLAIN '
+    return prefix + compiler.process(element.statement, **kw)
+
+
+# First-page and next-page statements of a paginated query
+def _page_queries(name, table, query, sort_col, id_col, now, limit=API_PAGE_SIZE):
+    # The first page may walk the index from its end; every later page must seek
+    entries = []
+    for page, position, seek in (('first page', None, False), ('next page', (now, 1000), True)):
+        for part, statement in enumerate(keyset_queries(query, sort_col, id_col, position)):
+            label = f"{name}, {page}" + (", undated rows" if part else "")
+            entries.append((label, table, statement.limit(limit), seek))
+    return entries
+
+
+# Hot queries, the table each one must reach through an index, and
+# whether it must seek into the index rather than scan it
+def hot_queries():
+    now = datetime.utcnow()
+    return [
+        ('active disasters', 'disaster',
+         select(Disaster.id).where(Disaster.is_active == True), False),
+        ('disasters by state and type', 'disaster',
+         select(Disaster.id).where(Disaster.state_id == 1, Disaster.disaster_type_id == 1), False),
+        ('disasters in a date range', 'disaster',
+         select(Disaster.id).where(Disaster.start_date >= now - timedelta(days=30), Disaster.start_date < now),
+         True),
+        ('ingest dedupe lookup', 'disaster',
+         select(Disaster.id).where(Disaster.source == 'NASA EONET', Disaster.title == 'x',
+                                   Disaster.start_date == now), True),
+        ('alerts of a disaster', 'disaster_alert',
+         select(DisasterAlert.id).where(DisasterAlert.disaster_id == 1), True),
+        ('risk assessment lookup', 'risk_assessment',
+         select(RiskAssessment.id).where(RiskAssessment.disaster_type_id == 1, RiskAssessment.state_id == 1),
+         True),
+        ('rollup range', 'disaster_daily_rollup',
+         select(DisasterDailyRollup.disaster_count)
+         .where(DisasterDailyRollup.day >= (now - timedelta(days=365)).date(), DisasterDailyRollup.day < now.date()),
+         True),
+        # Paginated endpoints, with their default filters
+        *_page_queries('/api/disasters', 'disaster', disaster_projection(),
+                       Disaster.start_date, Disaster.id, now),
+        *_page_queries('/api/alerts', 'disaster_alert', alert_projection(active_only=True),
+                       DisasterAlert.issued_at, DisasterAlert.id, now),
+        *_page_queries('/alerts', 'disaster_alert',
+                       select(DisasterAlert.id).where(DisasterAlert.is_test == False),
+                       DisasterAlert.issued_at, DisasterAlert.id, now),
+    ]
+
+
+def _plan_problems(plan, table, seek):
+    # Full scans of the table (or of a whole index where a seek is needed),
+    # or a separate sort step instead of index order
+    problems = []
+    for line in plan:
+        if db.engine.dialect.name == 'sqlite':
+            if line.startswith(f"SCAN {table}") and (seek or 'USING' not in line):
+                problems.append(line)
+            elif 'USE TEMP B-TREE FOR ORDER BY' in line:
+                problems.append(line)
+        else:
+            node = line.strip().removeprefix('->').strip()
+            if node.startswith(f"Seq Scan on {table}") or node.startswith(('Sort', 'Incremental Sort')):
+                problems.append(line.strip())
+    return problems
+
+
+# Run EXPLAIN on every hot query and report the ones not served by an index
+def check_query_plans():
+    """
+    Returns:
+        List of (name, plan lines, problems) for every hot query
+
+    PostgreSQL may still prefer a sequential scan on small tables, so
+    problems reported there are only meaningful on production-sized data.
+    """
+    results = []
+    with app.app_context():
+        for name, table, statement, seek in hot_queries():
+            rows = db.session.execute(Explain(statement)).all()
+            # SQLite returns (id, parent, notused, detail), PostgreSQL one text column
+            plan = [row[-1] for row in rows]
+            results.append((name, plan, _plan_problems(plan, table, seek)))
+    return results
+
+
+if __name__ == '__main__':
+    run_migrations()
+
+    failed = False
+    for name, plan, problems in check_query_plans():
+        status = 'FULL SCAN' if problems else 'ok'
+        print(f"{status:9} {name}")
+        for line in plan:
+            print(f"          {line}")
+        failed = failed or bool(problems)
+
+    sys.exit(1 if failed else 0)
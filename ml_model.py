@@ -8,9 +8,6 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 from datetime import datetime
 
-# Import our web scraper for enhanced data collection
-import web_scraper
-
 logger = logging.getLogger(__name__)
 
 # Function to preprocess the data for ML model
@@ -178,6 +175,9 @@ def enrich_data_from_external_sources(base_data):
         
     logger.info("Enriching data from external sources")
     
+    # Import our web scraper for enhanced data collection (trafilatura is only loaded here)
+    import web_scraper
+    
     # Create a copy to avoid modifying the original
     enhanced_data = base_data.copy()
     
@@ -237,6 +237,7 @@ def deep_learning_prediction(data=None, disaster_type=None, location=None):
         Prediction results and data sources used
     """
     logger.info("Running enhanced deep learning prediction with web data integration")
+    import web_scraper
     
     try:
         # Collect data for analysis
@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+from geohash_codec import maintain_geohash
 
 class DisasterType(db.Model):
     """Model for types of disasters"""
@@ -25,8 +26,16 @@ class State(db.Model):
         return f"<State {self.name}>"
 
 
+@maintain_geohash
 class Disaster(db.Model):
     """Model for historical disaster events"""
+    __table_args__ = (
+        db.Index('ix_disaster_state_type', 'state_id', 'disaster_type_id'),
+        db.Index('ix_disaster_start_date_id', 'start_date', 'id'),  # Newest-first pages
+        db.Index('ix_disaster_active_start_date', 'is_active', 'start_date', 'id'),
+        db.Index('uq_disaster_source_title_start_date', 'source', 'title', 'start_date', unique=True),  # Ingest upsert key
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     disaster_type_id = db.Column(db.Integer, db.ForeignKey('disaster_type.id'), nullable=False)
     state_id = db.Column(db.Integer, db.ForeignKey('state.id'), nullable=False)
@@ -48,6 +57,7 @@ class Disaster(db.Model):
     # Geolocation
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12), index=True)  # Maintained from latitude/longitude
     
     # Data source
     source = db.Column(db.String(100))
@@ -60,8 +70,14 @@ class Disaster(db.Model):
         return f"<Disaster {self.title}>"
 
 
+@maintain_geohash
 class RiskAssessment(db.Model):
     """Model for risk assessments of different areas"""
+    __table_args__ = (
+        db.Index('ix_risk_assessment_type_state', 'disaster_type_id', 'state_id'),
+        db.Index('ix_risk_assessment_risk_level', 'risk_level'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     state_id = db.Column(db.Integer, db.ForeignKey('state.id'), nullable=False)
     disaster_type_id = db.Column(db.Integer, db.ForeignKey('disaster_type.id'), nullable=False)
@@ -72,6 +88,7 @@ class RiskAssessment(db.Model):
     # Geolocation
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
+    geohash = db.Column(db.String(12), index=True)  # Maintained from latitude/longitude
     
     probability = db.Column(db.Float)  # Probability score from the ML model
     
@@ -84,6 +101,12 @@ class RiskAssessment(db.Model):
 
 class DisasterAlert(db.Model):
     """Model for active alerts"""
+    __table_args__ = (
+        db.Index('ix_disaster_alert_active_issued_at', 'is_active', 'issued_at', 'id'),  # Active-only pages
+        db.Index('ix_disaster_alert_issued_at_id', 'issued_at', 'id'),  # Newest-first pages
+        db.Index('ix_disaster_alert_disaster_id', 'disaster_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     disaster_id = db.Column(db.Integer, db.ForeignKey('disaster.id'), nullable=False)
     disaster = db.relationship('Disaster')
@@ -103,3 +126,92 @@ class DisasterAlert(db.Model):
     
     def __repr__(self):
         return f"<DisasterAlert {self.title}>"
+
+
+class AlertEvent(db.Model):
+    """Change sequence of alert events, read by the alert stream"""
+    __table_args__ = {'sqlite_autoincrement': True}  # ids are never reused after pruning
+    
+    id = db.Column(db.Integer, primary_key=True)
+    alert_id = db.Column(db.Integer, db.ForeignKey('disaster_alert.id'), nullable=False)
+    event = db.Column(db.String(20), nullable=False)  # created, updated or expired
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<AlertEvent {self.id} {self.event}>"
+
+
+class DisasterDailyRollup(db.Model):
+    """Disaster counts and severity sums per day, disaster type and state"""
+    day = db.Column(db.Date, primary_key=True)
+    disaster_type_id = db.Column(db.Integer, db.ForeignKey('disaster_type.id'), primary_key=True)
+    state_id = db.Column(db.Integer, db.ForeignKey('state.id'), primary_key=True)
+    
+    disaster_count = db.Column(db.Integer, nullable=False, default=0)
+    severity_sum = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<DisasterDailyRollup {self.day} {self.disaster_type_id}/{self.state_id}>"
+
+
+class SyncState(db.Model):
+    """Incremental sync position for each external data source"""
+    source = db.Column(db.String(50), primary_key=True)
+    
+    # Validators from the last successful response, sent back as conditional headers
+    etag = db.Column(db.String(255))
+    last_modified = db.Column(db.String(64))  # HTTP date, stored verbatim
+    
+    newest_event_at = db.Column(db.DateTime)  # Watermark: newest event date received
+    last_success_at = db.Column(db.DateTime)
+    last_attempt_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f"<SyncState {self.source}>"
+
+
+class CollectorLease(db.Model):
+    """Lease held by the one process allowed to run the scheduled jobs"""
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(255), nullable=False)  # host:pid of the current holder
+    acquired_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<CollectorLease {self.name} held by {self.holder}>"
+
+
+class CollectionRun(db.Model):
+    """History of data collection runs"""
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, nullable=False, index=True)
+    finished_at = db.Column(db.DateTime)
+    status = db.Column(db.String(20), nullable=False)  # running, succeeded or failed
+    error = db.Column(db.Text)
+    
+    duration_seconds = db.Column(db.Float)
+    stages = db.Column(db.Text)  # JSON string: stage -> seconds, rows and per-source seconds
+    sources = db.Column(db.Text)  # JSON string: source name -> whether it was collected
+    
+    def __repr__(self):
+        return f"<CollectionRun {self.id} {self.status}>"
+
+
+class SchemaMigration(db.Model):
+    """Schema migrations applied to this database"""
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SchemaMigration {self.version} {self.name}>"
+
+
+class DataVersion(db.Model):
+    """Single-row counter bumped whenever disaster, alert or risk data changes"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<DataVersion {self.version}>"
@@ -0,0 +1,228 @@
+import logging
+import threading
+from datetime import timedelta
+import numpy as np
+from sqlalchemy import func, select
+from app import app, db
+from models import Disaster, RiskAssessment
+from geo import EARTH_RADIUS_KM
+from versioning import current_data_version
+from singleflight import SingleFlight
+from projections import (
+    disaster_projection, risk_assessment_projection,
+    serialize_disaster, serialize_risk_assessment, fetch_serialized
+)
+
+logger = logging.getLogger(__name__)
+
+# Number of incrementally added points kept outside the tree before it is rebuilt
+NEARBY_REBUILD_THRESHOLD = 256
+
+# Rows updated this long before the newest seen update are read again, so
+# writers with slightly skewed clocks cannot slip past the watermark
+NEARBY_SYNC_OVERLAP_SECONDS = 300
+
+
+class NearbyIndex:
+    """
+    In-memory haversine BallTree over serialized records with coordinates.
+
+    The index is labelled with the data version it reflects. When another
+    process changes the data, an index with a changes callable reads only
+    the rows past its watermark: new records go to a small delta buffer
+    that is searched by brute force and folded into the tree once it grows
+    past a threshold, and changed or deactivated records are replaced in
+    memory. Re-read records that did not change are ignored. Indexes
+    without a changes callable, or whose record count no longer matches
+    the database after applying the changes, reload everything.
+
+    loader() returns (records, watermark); changes(watermark) returns
+    (watermark, changed records, expected record count), where changed
+    records include ones that should drop out of the index.
+    """
+
+    def __init__(self, name, loader, changes=None, is_indexed=None):
+        self.name = name
+        self.loader = loader
+        self.changes = changes
+        self.is_indexed = is_indexed or (lambda record: True)
+        self._lock = threading.Lock()
+        self._tree = None
+        self._records = []
+        self._delta_points = []
+        self._delta_records = []
+        self._version = None
+        self._watermark = None
+        self._reload_flight = SingleFlight(f'nearby-{name}')
+
+    # Build a BallTree from [lat, lon] radian pairs
+    @staticmethod
+    def _build_tree(points):
+        from sklearn.neighbors import BallTree
+        if len(points) == 0:
+            return None
+        return BallTree(np.asarray(points, dtype=float), metric='haversine')
+
+    @staticmethod
+    def _to_radians(records):
+        return [[np.radians(r['latitude']), np.radians(r['longitude'])] for r in records]
+
+    @staticmethod
+    def _has_coordinates(record):
+        return record['latitude'] is not None and record['longitude'] is not None
+
+    # Replace the whole index with fresh records from the loader
+    def reload(self):
+        with app.app_context():
+            version = current_data_version()[0]
+            records, watermark = self.loader()
+        records = [r for r in records if self._has_coordinates(r)]
+        tree = self._build_tree(self._to_radians(records))
+        with self._lock:
+            self._tree = tree
+            self._records = records
+            self._delta_points = []
+            self._delta_records = []
+            self._version = version
+            self._watermark = watermark
+        logger.info(f"Nearby index '{self.name}' loaded with {len(records)} points")
+
+    # Bring a loaded index up to date from the rows past its watermark
+    def refresh(self):
+        if self.changes is None or self._version is None:
+            return self.reload()
+
+        with app.app_context():
+            version = current_data_version()[0]
+            watermark, changed, expected = self.changes(self._watermark)
+
+        with self._lock:
+            records = self._records + self._delta_records
+            # Rows re-read within the overlap usually match what is held already
+            held = {r['id']: r for r in records}
+            changed = [r for r in changed if held.get(r['id']) != r and (r['id'] in held or self.is_indexed(r))]
+            changed_ids = {r['id'] for r in changed}
+            added = [r for r in changed if self.is_indexed(r) and self._has_coordinates(r)]
+
+            replaced = any(r_id in held for r_id in changed_ids)
+            if replaced:
+                records = [r for r in records if r['id'] not in changed_ids]
+            if len(records) + len(added) != expected:
+                # Rows were deleted, or the index missed a change; start over
+                stale = True
+            else:
+                stale = False
+                if replaced or len(self._delta_records) + len(added) > NEARBY_REBUILD_THRESHOLD:
+                    self._records = records + added
+                    self._tree = self._build_tree(self._to_radians(self._records))
+                    self._delta_points = []
+                    self._delta_records = []
+                else:
+                    self._delta_points.extend(self._to_radians(added))
+                    self._delta_records.extend(added)
+                self._version = version
+                self._watermark = watermark
+
+        if stale:
+            logger.info(f"Nearby index '{self.name}' is out of step with the database, reloading")
+            return self.reload()
+        if changed:
+            logger.info(f"Nearby index '{self.name}' refreshed with {len(changed)} changed records")
+
+    def _ensure_loaded(self):
+        version = self._version
+        if version is None or version != current_data_version()[0]:
+            # Concurrent queries on a stale index share one refresh
+            self._reload_flight.do('refresh', self.refresh)
+
+    # Records within radius_km of a point, nearest first
+    def query(self, lat, lon, radius_km, limit=None):
+        """
+        Returns:
+            List of (distance_km, record) tuples sorted by distance
+        """
+        self._ensure_loaded()
+        with self._lock:
+            tree, records = self._tree, self._records
+            delta_points, delta_records = list(self._delta_points), list(self._delta_records)
+
+        point = np.radians([[lat, lon]])
+        radius = radius_km / EARTH_RADIUS_KM
+        results = []
+
+        if tree is not None:
+            indices, distances = tree.query_radius(point, r=radius, return_distance=True, sort_results=True)
+            results.extend((float(d) * EARTH_RADIUS_KM, records[i]) for i, d in zip(indices[0], distances[0]))
+
+        if delta_points:
+            # Vectorized haversine over the small delta buffer
+            delta = np.asarray(delta_points)
+            d_lat = delta[:, 0] - point[0, 0]
+            d_lon = delta[:, 1] - point[0, 1]
+            a = np.sin(d_lat / 2) ** 2 + np.cos(point[0, 0]) * np.cos(delta[:, 0]) * np.sin(d_lon / 2) ** 2
+            distances = 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+            for i in np.nonzero(distances <= radius)[0]:
+                results.append((float(distances[i]) * EARTH_RADIUS_KM, delta_records[i]))
+            results.sort(key=lambda item: item[0])
+
+        return results[:limit] if limit else results
+
+
+# Newest id and change time of a table, read before the rows they cover
+def _watermark(id_col, changed_col):
+    max_id, max_changed_at = db.session.execute(select(func.max(id_col), func.max(changed_col))).one()
+    return max_id or 0, max_changed_at
+
+
+# Rows added or changed since a watermark, allowing for the clock overlap
+def _changed_since(watermark, id_col, changed_col):
+    since_id, since_changed_at = watermark
+    changed = id_col > since_id
+    if since_changed_at is not None:
+        overlap = timedelta(seconds=NEARBY_SYNC_OVERLAP_SECONDS)
+        changed = db.or_(changed, changed_col >= since_changed_at - overlap)
+    return changed
+
+
+# Loaders for the two indexes
+def _load_active_disasters():
+    watermark = _watermark(Disaster.id, Disaster.updated_at)
+    return fetch_serialized(disaster_projection(active_only=True), serialize_disaster), watermark
+
+
+def _active_disaster_changes(watermark):
+    new_watermark = _watermark(Disaster.id, Disaster.updated_at)
+    # Inactive rows are read too, so deactivated disasters leave the index
+    records = fetch_serialized(
+        disaster_projection().where(_changed_since(watermark, Disaster.id, Disaster.updated_at)),
+        serialize_disaster
+    )
+    expected = db.session.execute(
+        select(func.count(Disaster.id)).where(
+            Disaster.is_active == True, Disaster.latitude.isnot(None), Disaster.longitude.isnot(None)
+        )
+    ).scalar()
+    return new_watermark, records, expected
+
+
+# Risk assessments are only ever written with a fresh last_assessed
+def _load_risk_zones():
+    watermark = _watermark(RiskAssessment.id, RiskAssessment.last_assessed)
+    return fetch_serialized(risk_assessment_projection(), serialize_risk_assessment), watermark
+
+
+def _risk_zone_changes(watermark):
+    new_watermark = _watermark(RiskAssessment.id, RiskAssessment.last_assessed)
+    records = fetch_serialized(
+        risk_assessment_projection().where(
+            _changed_since(watermark, RiskAssessment.id, RiskAssessment.last_assessed)
+        ),
+        serialize_risk_assessment
+    )
+    expected = db.session.execute(select(func.count(RiskAssessment.id))).scalar()
+    return new_watermark, records, expected
+
+
+disaster_index = NearbyIndex('disasters', _load_active_disasters, _active_disaster_changes,
+                             is_indexed=lambda record: record['is_active'])
+risk_zone_index = NearbyIndex('risk_zones', _load_risk_zones, _risk_zone_changes)
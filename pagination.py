@@ -0,0 +1,115 @@
+import os
+import base64
+import logging
+from datetime import datetime
+from sqlalchemy import or_
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Default and maximum page sizes for paginated API endpoints
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", 100))
+API_MAX_PAGE_SIZE = 1000
+
+
+# Encode the (sort value, id) position of a row as an opaque token
+def encode_cursor(sort_value, row_id):
+    # An empty sort value stands for NULL
+    raw = f"{sort_value.isoformat() if sort_value is not None else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+# Decode a cursor token back into (sort value, id)
+def decode_cursor(token):
+    """
+    Raises:
+        ValueError: if the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        sort_value, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(sort_value) if sort_value else None, int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid 'cursor'")
+
+
+# Clamp a requested page size to the allowed range
+def page_limit(requested):
+    if not requested or requested < 1:
+        return API_PAGE_SIZE
+    return min(requested, API_MAX_PAGE_SIZE)
+
+
+# Statements reading the rows after a position, newest first
+def keyset_queries(query, sort_col, id_col, position=None):
+    """
+    Each statement is a seek on a (sort_col, id_col) index in plain
+    descending order. The row-value bound is spelled out as
+    sort <= v AND (sort < v OR id < x) so SQLite and PostgreSQL can both
+    start the index range at v. Rows with a NULL sort value come last,
+    read by a second statement, so neither statement needs NULLS LAST
+    ordering or an OR across NULLs that would defeat the index.
+
+    Args:
+        query: A select() statement
+        sort_col, id_col: Columns defining the order
+        position: (sort value, id) of the last row already returned, or
+            None to start from the newest row
+
+    Returns:
+        List of statements to read in order
+    """
+    query = query.order_by(None)
+    sort_value, row_id = position if position else (None, None)
+    statements = []
+
+    if position is None or sort_value is not None:
+        dated = query.order_by(sort_col.desc(), id_col.desc())
+        if position is not None:
+            dated = dated.where(sort_col <= sort_value, or_(sort_col < sort_value, id_col < row_id))
+        if sort_col.nullable:
+            dated = dated.where(sort_col.isnot(None))
+        statements.append(dated)
+
+    if sort_col.nullable:
+        undated = query.where(sort_col.is_(None)).order_by(id_col.desc())
+        if position is not None and sort_value is None:
+            undated = undated.where(id_col < row_id)
+        statements.append(undated)
+
+    return statements
+
+
+# Fetch one page of a query in (sort_col DESC, id_col DESC) order, NULL sort values last
+def keyset_page(query, sort_col, id_col, cursor=None, limit=API_PAGE_SIZE, scalars=False):
+    """
+    Keyset (seek) pagination: the cursor holds the position of the last
+    row already returned, so every page is a bounded index range scan no
+    matter how deep it is.
+
+    Args:
+        query: A select() statement (projection or entity)
+        sort_col, id_col: Columns defining the order; id_col breaks ties
+        cursor: Token from a previous page, or None for the first page
+        limit: Page size
+        scalars: Return ORM entities instead of rows
+
+    Returns:
+        Tuple of (rows, next_cursor); next_cursor is None on the last page
+    """
+    position = decode_cursor(cursor) if cursor else None
+
+    rows = []
+    for statement in keyset_queries(query, sort_col, id_col, position):
+        result = db.session.execute(statement.limit(limit + 1 - len(rows)))
+        rows.extend(result.scalars().all() if scalars else result.all())
+        if len(rows) > limit:
+            break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_col.key), getattr(last, id_col.key))
+
+    return rows, next_cursor
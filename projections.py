@@ -0,0 +1,182 @@
+import logging
+from sqlalchemy import select
+from app import db
+from models import Disaster, DisasterType, State, RiskAssessment, DisasterAlert
+
+logger = logging.getLogger(__name__)
+
+# Projection queries for the JSON API.
+# Each endpoint selects exactly the columns it serializes, joined to the
+# disaster_type and state tables in one statement, so no ORM instances are
+# built and no lazy loads are triggered while serializing rows.
+
+
+# Filter conditions shared by the disaster projection and map clustering
+def disaster_filters(disaster_type_id=None, state_id=None, active_only=False):
+    conditions = []
+
+    if disaster_type_id:
+        conditions.append(Disaster.disaster_type_id == disaster_type_id)
+
+    if state_id:
+        conditions.append(Disaster.state_id == state_id)
+
+    if active_only:
+        conditions.append(Disaster.is_active == True)
+
+    return conditions
+
+
+# Build the projection query for /api/disasters
+def disaster_projection(disaster_type_id=None, state_id=None, active_only=False):
+    query = (
+        select(
+            Disaster.id,
+            Disaster.title,
+            DisasterType.name.label('type_name'),
+            State.name.label('state_name'),
+            Disaster.start_date,
+            Disaster.end_date,
+            Disaster.is_active,
+            Disaster.severity,
+            Disaster.latitude,
+            Disaster.longitude,
+            Disaster.description
+        )
+        .join(DisasterType, Disaster.disaster_type_id == DisasterType.id)
+        .join(State, Disaster.state_id == State.id)
+        .where(*disaster_filters(disaster_type_id, state_id, active_only))
+    )
+
+    return query.order_by(Disaster.id)
+
+
+# Serialize a disaster projection row
+def serialize_disaster(row):
+    return {
+        'id': row.id,
+        'title': row.title,
+        'type': row.type_name,
+        'state': row.state_name,
+        'start_date': row.start_date.strftime('%Y-%m-%d'),
+        'end_date': row.end_date.strftime('%Y-%m-%d') if row.end_date else None,
+        'is_active': row.is_active,
+        'severity': row.severity,
+        'latitude': row.latitude,
+        'longitude': row.longitude,
+        'description': row.description
+    }
+
+
+# Filter conditions shared by the risk assessment projection and map clustering
+def risk_assessment_filters(disaster_type_id=None, state_id=None, min_risk_level=1):
+    conditions = []
+
+    if disaster_type_id:
+        conditions.append(RiskAssessment.disaster_type_id == disaster_type_id)
+
+    if state_id:
+        conditions.append(RiskAssessment.state_id == state_id)
+
+    if min_risk_level and min_risk_level > 1:
+        conditions.append(RiskAssessment.risk_level >= min_risk_level)
+
+    return conditions
+
+
+# Build the projection query for /api/risk_assessments
+def risk_assessment_projection(disaster_type_id=None, state_id=None, min_risk_level=1):
+    query = (
+        select(
+            RiskAssessment.id,
+            RiskAssessment.location_name,
+            DisasterType.name.label('type_name'),
+            State.name.label('state_name'),
+            RiskAssessment.risk_level,
+            RiskAssessment.latitude,
+            RiskAssessment.longitude,
+            RiskAssessment.details,
+            RiskAssessment.last_assessed
+        )
+        .join(DisasterType, RiskAssessment.disaster_type_id == DisasterType.id)
+        .join(State, RiskAssessment.state_id == State.id)
+        .where(*risk_assessment_filters(disaster_type_id, state_id, min_risk_level))
+    )
+
+    return query.order_by(RiskAssessment.id)
+
+
+# Serialize a risk assessment projection row
+def serialize_risk_assessment(row):
+    return {
+        'id': row.id,
+        'location_name': row.location_name,
+        'disaster_type': row.type_name,
+        'state': row.state_name,
+        'risk_level': row.risk_level,
+        'latitude': row.latitude,
+        'longitude': row.longitude,
+        'details': row.details,
+        'last_assessed': row.last_assessed.strftime('%Y-%m-%d')
+    }
+
+
+# Build the projection query for /api/alerts
+def alert_projection(disaster_type_id=None, state_id=None, active_only=True):
+    query = (
+        select(
+            DisasterAlert.id,
+            DisasterAlert.title,
+            DisasterAlert.message,
+            DisasterAlert.alert_level,
+            DisasterAlert.issued_at,
+            DisasterAlert.expires_at,
+            DisasterAlert.is_active,
+            Disaster.id.label('disaster_id'),
+            Disaster.title.label('disaster_title'),
+            DisasterType.name.label('type_name'),
+            State.name.label('state_name'),
+            Disaster.latitude,
+            Disaster.longitude
+        )
+        .join(Disaster, DisasterAlert.disaster_id == Disaster.id)
+        .join(DisasterType, Disaster.disaster_type_id == DisasterType.id)
+        .join(State, Disaster.state_id == State.id)
+    )
+
+    if disaster_type_id:
+        query = query.where(Disaster.disaster_type_id == disaster_type_id)
+
+    if state_id:
+        query = query.where(Disaster.state_id == state_id)
+
+    if active_only:
+        query = query.where(DisasterAlert.is_active == True)
+
+    return query.order_by(DisasterAlert.issued_at.desc())
+
+
+# Serialize an alert projection row
+def serialize_alert(row):
+    return {
+        'id': row.id,
+        'title': row.title,
+        'message': row.message,
+        'alert_level': row.alert_level,
+        'issued_at': row.issued_at.strftime('%Y-%m-%d %H:%M') if row.issued_at else None,
+        'expires_at': row.expires_at.strftime('%Y-%m-%d %H:%M') if row.expires_at else None,
+        'is_active': row.is_active,
+        'disaster': {
+            'id': row.disaster_id,
+            'title': row.disaster_title,
+            'type': row.type_name,
+            'state': row.state_name,
+            'latitude': row.latitude,
+            'longitude': row.longitude
+        }
+    }
+
+
+# Run a projection query and serialize every row
+def fetch_serialized(query, serializer):
+    return [serializer(row) for row in db.session.execute(query)]
@@ -0,0 +1,289 @@
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import exists, func, select
+from app import app, db
+from models import Disaster, DisasterType, State, RiskAssessment, DisasterAlert
+
+logger = logging.getLogger(__name__)
+
+
+# Reference data every deployment needs
+DISASTER_TYPES = {
+    "Flood": "Overflow of water that submerges land that is usually dry",
+    "Earthquake": "Sudden shaking of the ground due to movement of tectonic plates",
+    "Tsunami": "Series of ocean waves caused by an underwater earthquake, landslide, or volcanic eruption",
+    "Forest Fire": "Uncontrolled fire occurring in forests and other wildland areas"
+}
+
+MALAYSIAN_STATES = [
+    "Johor", "Kedah", "Kelantan", "Melaka", "Negeri Sembilan", 
+    "Pahang", "Perak", "Perlis", "Penang", "Sabah", "Sarawak", 
+    "Selangor", "Terengganu", "Kuala Lumpur", "Labuan", "Putrajaya"
+]
+
+
+# Whether every reference and sample row is already in place, in one query
+def reference_data_ready():
+    counts = select(
+        select(func.count(DisasterType.id)).where(DisasterType.name.in_(DISASTER_TYPES)).scalar_subquery(),
+        select(func.count(State.id)).where(State.name.in_(MALAYSIAN_STATES)).scalar_subquery(),
+        exists().where(Disaster.id.isnot(None)),
+        exists().where(RiskAssessment.id.isnot(None))
+    )
+    types, states, has_disasters, has_assessments = db.session.execute(counts).one()
+    return (types == len(DISASTER_TYPES) and states == len(MALAYSIAN_STATES)
+            and bool(has_disasters) and bool(has_assessments))
+
+
+# Initialize disaster types and Malaysian states
+def initialize_reference_data():
+    with app.app_context():
+        # Every worker calls this on startup; normally there is nothing to do
+        if reference_data_ready():
+            return
+        
+        # Initialize disaster types if not present
+        disaster_type_map = {
+            disaster_type.name: disaster_type
+            for disaster_type in db.session.execute(
+                select(DisasterType).where(DisasterType.name.in_(DISASTER_TYPES))
+            ).scalars()
+        }
+        missing_types = [DisasterType(name=name, description=description)
+                         for name, description in DISASTER_TYPES.items() if name not in disaster_type_map]
+        
+        # Initialize Malaysian states if not present
+        state_map = {
+            state.name: state
+            for state in db.session.execute(select(State).where(State.name.in_(MALAYSIAN_STATES))).scalars()
+        }
+        missing_states = [State(name=name) for name in MALAYSIAN_STATES if name not in state_map]
+        
+        if missing_types or missing_states:
+            db.session.add_all(missing_types + missing_states)
+            db.session.flush()  # Get IDs without committing
+            disaster_type_map.update({disaster_type.name: disaster_type for disaster_type in missing_types})
+            state_map.update({state.name: state for state in missing_states})
+        
+        # Add sample disasters if none exist
+        if Disaster.query.count() == 0:
+            # Malaysian state coordinates (approximate centers)
+            state_coordinates = {
+                "Johor": (1.8541, 103.7377),
+                "Kedah": (6.1184, 100.3685),
+                "Kelantan": (5.3837, 102.0292),
+                "Melaka": (2.1896, 102.2501),
+                "Negeri Sembilan": (2.7258, 102.2377),
+                "Pahang": (3.8126, 103.3256),
+                "Perak": (4.5921, 101.0901),
+                "Perlis": (6.4449, 100.2059),
+                "Penang": (5.4141, 100.3288),
+                "Sabah": (5.9804, 116.0735),
+                "Sarawak": (1.5533, 110.3592),
+                "Selangor": (3.0738, 101.5183),
+                "Terengganu": (5.3117, 103.1324),
+                "Kuala Lumpur": (3.1390, 101.6869),
+                "Labuan": (5.2831, 115.2308),
+                "Putrajaya": (2.9264, 101.6964)
+            }
+            
+            # Sample disasters for demonstration
+            sample_disasters = [
+                {
+                    "type": "Flood",
+                    "state": "Kelantan",
+                    "title": "Kelantan River Flooding",
+                    "description": "Severe flooding along the Kelantan River affecting multiple districts.",
+                    "start_date": datetime(2025, 1, 15),
+                    "end_date": datetime(2025, 1, 25),
+                    "is_active": False,
+                    "area_affected": 120.5,
+                    "severity": 4,
+                    "latitude": 5.3837,
+                    "longitude": 102.0292,
+                    "source": "Sample Data"
+                },
+                {
+                    "type": "Flood",
+                    "state": "Terengganu",
+                    "title": "Terengganu Monsoon Flooding",
+                    "description": "Monsoon season flooding affecting coastal areas of Terengganu.",
+                    "start_date": datetime(2025, 2, 10),
+                    "end_date": datetime(2025, 2, 20),
+                    "is_active": False,
+                    "area_affected": 85.2,
+                    "severity": 3,
+                    "latitude": 5.3117, 
+                    "longitude": 103.1324,
+                    "source": "Sample Data"
+                },
+                {
+                    "type": "Earthquake",
+                    "state": "Sabah",
+                    "title": "Ranau Earthquake",
+                    "description": "5.9 magnitude earthquake near Mount Kinabalu with multiple aftershocks.",
+                    "start_date": datetime(2025, 3, 5),
+                    "end_date": datetime(2025, 3, 5),
+                    "is_active": False,
+                    "magnitude": 5.9,
+                    "severity": 4,
+                    "latitude": 5.9804,
+                    "longitude": 116.0735,
+                    "source": "Sample Data"
+                },
+                {
+                    "type": "Forest Fire",
+                    "state": "Selangor",
+                    "title": "Kuala Langat Forest Reserve Fire",
+                    "description": "Large forest fire in the Kuala Langat Forest Reserve during dry season.",
+                    "start_date": datetime(2025, 4, 12),
+                    "is_active": True,
+                    "area_affected": 250.8,
+                    "severity": 4,
+                    "latitude": 3.0738,
+                    "longitude": 101.5183,
+                    "source": "Sample Data"
+                },
+                {
+                    "type": "Tsunami",
+                    "state": "Penang",
+                    "title": "Penang Coastal Tsunami Warning",
+                    "description": "Tsunami warning issued for Penang coastal areas following offshore earthquake.",
+                    "start_date": datetime(2025, 5, 1),
+                    "is_active": True,
+                    "depth": 85.0,
+                    "severity": 5,
+                    "latitude": 5.4141,
+                    "longitude": 100.3288,
+                    "source": "Sample Data"
+                }
+            ]
+            
+            for disaster_data in sample_disasters:
+                disaster_type = disaster_type_map[disaster_data["type"]]
+                state = state_map[disaster_data["state"]]
+                
+                disaster = Disaster(
+                    disaster_type_id=disaster_type.id,
+                    state_id=state.id,
+                    title=disaster_data["title"],
+                    description=disaster_data["description"],
+                    start_date=disaster_data["start_date"],
+                    end_date=disaster_data.get("end_date"),
+                    is_active=disaster_data["is_active"],
+                    magnitude=disaster_data.get("magnitude"),
+                    depth=disaster_data.get("depth"),
+                    area_affected=disaster_data.get("area_affected"),
+                    severity=disaster_data["severity"],
+                    latitude=disaster_data["latitude"],
+                    longitude=disaster_data["longitude"],
+                    source=disaster_data["source"],
+                    source_url="https://example.com/sample-data"
+                )
+                db.session.add(disaster)
+            
+            # Add sample alerts
+            for disaster in Disaster.query.filter_by(is_active=True).all():
+                # Define external sources based on disaster type
+                sources_used = []
+                external_references = []
+                
+                if disaster.type.name == "Flood":
+                    sources_used = ["NASA FIRMS satellite data", "Malaysian Meteorological Department rainfall data", "Historical flood patterns"]
+                    external_references = [
+                        "https://www.met.gov.my/",
+                        "https://firms.modaps.eosdis.nasa.gov/",
+                        "https://www.water.gov.my/"
+                    ]
+                elif disaster.type.name == "Earthquake":
+                    sources_used = ["USGS seismic activity reports", "Regional geological surveys", "Historical seismic events database"]
+                    external_references = [
+                        "https://earthquake.usgs.gov/",
+                        "https://www.jmg.gov.my/",
+                        "https://www.emsc-csem.org/"
+                    ]
+                elif disaster.type.name == "Tsunami":
+                    sources_used = ["Pacific Tsunami Warning Center", "Ocean depth sensors data", "Coastal vulnerability analysis"]
+                    external_references = [
+                        "https://ptwc.weather.gov/",
+                        "https://ioc-tsunami.org/",
+                        "https://www.noaa.gov/"
+                    ]
+                elif disaster.type.name == "Forest Fire":
+                    sources_used = ["NASA MODIS fire detection", "Weather pattern analysis", "Vegetation density mapping"]
+                    external_references = [
+                        "https://firms.modaps.eosdis.nasa.gov/",
+                        "https://www.met.gov.my/",
+                        "https://www.forestry.gov.my/"
+                    ]
+                
+                # Format lists as comma-separated strings
+                sources_str = ", ".join(sources_used)
+                references_str = ", ".join(external_references)
+                
+                alert = DisasterAlert(
+                    disaster_id=disaster.id,
+                    title=f"Alert: {disaster.title}",
+                    message=f"Emergency alert for {disaster.title}. Please follow safety protocols and evacuation procedures if in affected area.",
+                    alert_level=disaster.severity,
+                    issued_at=disaster.start_date,
+                    expires_at=datetime.utcnow() + timedelta(days=7) if disaster.is_active else None,
+                    is_active=disaster.is_active,
+                    is_test=False,
+                    sources_used=sources_str,
+                    external_references=references_str
+                )
+                db.session.add(alert)
+        
+        # Create some risk assessments if none exist
+        if RiskAssessment.query.count() == 0:
+            # Malaysian state coordinates (approximate centers)
+            state_coordinates = {
+                "Johor": (1.8541, 103.7377),
+                "Kedah": (6.1184, 100.3685),
+                "Kelantan": (5.3837, 102.0292),
+                "Melaka": (2.1896, 102.2501),
+                "Negeri Sembilan": (2.7258, 102.2377),
+                "Pahang": (3.8126, 103.3256),
+                "Perak": (4.5921, 101.0901),
+                "Perlis": (6.4449, 100.2059),
+                "Penang": (5.4141, 100.3288),
+                "Sabah": (5.9804, 116.0735),
+                "Sarawak": (1.5533, 110.3592),
+                "Selangor": (3.0738, 101.5183),
+                "Terengganu": (5.3117, 103.1324),
+                "Kuala Lumpur": (3.1390, 101.6869),
+                "Labuan": (5.2831, 115.2308),
+                "Putrajaya": (2.9264, 101.6964)
+            }
+            
+            # Generate risk assessments for each state and disaster type
+            for state_name, state in state_map.items():
+                for disaster_type_name, disaster_type in disaster_type_map.items():
+                    # Create risk level based on some pattern (for demonstration)
+                    risk_level = (hash(state_name + disaster_type_name) % 4) + 1  # 1-5 range
+                    
+                    # Set high risk for certain combinations
+                    if (state_name == "Kelantan" and disaster_type_name == "Flood") or \
+                       (state_name == "Sabah" and disaster_type_name == "Earthquake") or \
+                       (state_name == "Penang" and disaster_type_name == "Tsunami"):
+                        risk_level = 5
+                    
+                    # Get accurate coordinates for the state
+                    latitude, longitude = state_coordinates.get(state_name, (4.0, 102.0))
+                    
+                    assessment = RiskAssessment(
+                        state_id=state.id,
+                        disaster_type_id=disaster_type.id,
+                        location_name=f"{state_name} Center",
+                        risk_level=risk_level,
+                        latitude=latitude,
+                        longitude=longitude,
+                        probability=0.1 * risk_level,  # Simple probability
+                        details=f"Risk assessment for {disaster_type_name} in {state_name}",
+                        last_assessed=datetime.utcnow()
+                    )
+                    db.session.add(assessment)
+        
+        db.session.commit()
+        logger.info("Reference data initialized")
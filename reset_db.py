@@ -2,7 +2,7 @@ import os
 import logging
 from datetime import datetime, timedelta
 from app import app, db
-from models import Disaster, DisasterType, State, RiskAssessment, DisasterAlert
+from models import Disaster, DisasterType, State, RiskAssessment, DisasterAlert, AlertEvent, DisasterDailyRollup, SyncState
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -14,6 +14,10 @@ def reset_database():
         
         # Drop all data
         try:
+            # The sync watermarks would otherwise keep old events from being fetched again
+            SyncState.__table__.drop(db.engine, checkfirst=True)
+            AlertEvent.__table__.drop(db.engine)
+            DisasterDailyRollup.__table__.drop(db.engine)
             DisasterAlert.__table__.drop(db.engine)
             RiskAssessment.__table__.drop(db.engine)
             Disaster.__table__.drop(db.engine)
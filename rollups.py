@@ -0,0 +1,244 @@
+import logging
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, select, insert, delete, func, cast, tuple_, Date, inspect
+from sqlalchemy.orm import Session
+from app import app, db
+from models import Disaster, DisasterDailyRollup
+from versioning import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+# Supported /api/timeseries granularities
+GRANULARITIES = ('day', 'week', 'month')
+
+# Most buckets a single time series request may ask for
+MAX_TIMESERIES_BUCKETS = 1000
+
+# Bucket keys cleared per DELETE statement
+ROLLUP_DELETE_CHUNK = 500
+
+# Disaster attributes that decide which rollup bucket a row counts towards
+_BUCKET_ATTRIBUTES = ('start_date', 'disaster_type_id', 'state_id', 'severity')
+
+_rollup_table = DisasterDailyRollup.__table__
+
+
+def _day_expr(column):
+    # SQLite has no DATE type; date() returns the same ISO text the Date column stores
+    if db.engine.dialect.name == 'sqlite':
+        return func.date(column)
+    return cast(column, Date)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _grouped_counts(conditions):
+    # Per (day, type, state) counts and severity sums from the raw events
+    day = _day_expr(Disaster.start_date)
+    return (
+        select(
+            day.label('day'),
+            Disaster.disaster_type_id,
+            Disaster.state_id,
+            func.count(Disaster.id),
+            func.coalesce(func.sum(Disaster.severity), 0)
+        )
+        .where(*conditions)
+        .group_by(day, Disaster.disaster_type_id, Disaster.state_id)
+    )
+
+
+# Recompute the rollup rows for a set of (day, disaster_type_id, state_id) buckets
+def refresh_rollup_buckets(buckets, connection=None):
+    """
+    Buckets are recomputed from the disaster table rather than adjusted
+    by deltas, so refreshing a bucket twice (or after an update that moved
+    a row between buckets) is always safe.
+    """
+    buckets = {(_as_date(day), type_id, state_id) for day, type_id, state_id in buckets
+               if day is not None and type_id is not None and state_id is not None}
+    if not buckets:
+        return
+    connection = connection or db.session.connection()
+
+    # One grouped query over the window covering every affected bucket
+    days = [day for day, _, _ in buckets]
+    rows = connection.execute(_grouped_counts([
+        Disaster.start_date >= datetime.combine(min(days), datetime.min.time()),
+        Disaster.start_date < datetime.combine(max(days) + timedelta(days=1), datetime.min.time()),
+        Disaster.disaster_type_id.in_({type_id for _, type_id, _ in buckets}),
+        Disaster.state_id.in_({state_id for _, _, state_id in buckets})
+    ])).all()
+
+    # Clear the old rows, a chunk of keys at a time to stay under bind parameter limits
+    keys = list(buckets)
+    key_columns = tuple_(_rollup_table.c.day, _rollup_table.c.disaster_type_id, _rollup_table.c.state_id)
+    for offset in range(0, len(keys), ROLLUP_DELETE_CHUNK):
+        connection.execute(delete(_rollup_table).where(key_columns.in_(keys[offset:offset + ROLLUP_DELETE_CHUNK])))
+
+    values = []
+    for day, type_id, state_id, count, severity_sum in rows:
+        key = (_as_date(day), type_id, state_id)
+        if key in buckets:
+            values.append({
+                'day': key[0],
+                'disaster_type_id': type_id,
+                'state_id': state_id,
+                'disaster_count': count,
+                'severity_sum': severity_sum
+            })
+    if values:
+        connection.execute(insert(_rollup_table), values)
+
+
+# Rebuild the whole rollup table from the disaster table
+def rebuild_rollups():
+    with app.app_context():
+        try:
+            # Statistics are served from the rollups, so cached results must go
+            bump_data_version(db.session)
+            db.session.execute(delete(_rollup_table))
+            db.session.execute(
+                insert(_rollup_table).from_select(
+                    ['day', 'disaster_type_id', 'state_id', 'disaster_count', 'severity_sum'],
+                    _grouped_counts([])
+                )
+            )
+            db.session.commit()
+            total = db.session.execute(select(func.count()).select_from(_rollup_table)).scalar()
+            logger.info(f"Rebuilt disaster rollups ({total} buckets)")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error rebuilding disaster rollups: {str(e)}")
+
+
+# Build the rollups once for databases that had events before the table existed
+def ensure_rollups():
+    has_rollups = db.session.execute(select(_rollup_table.c.day).limit(1)).first()
+    has_disasters = db.session.execute(select(Disaster.id).limit(1)).first()
+    if has_disasters and not has_rollups:
+        rebuild_rollups()
+
+
+def _bucket_history(disaster):
+    # Old and new bucket of a modified disaster, or None if it did not move
+    state = inspect(disaster)
+    old, new, changed = [], [], False
+    for key in _BUCKET_ATTRIBUTES:
+        history = state.attrs[key].history
+        if history.added or history.deleted:
+            changed = True
+        old.append(history.deleted[0] if history.deleted else (history.unchanged[0] if history.unchanged else None))
+        new.append(history.added[0] if history.added else old[-1])
+    if not changed:
+        return None
+    return (old[0], old[1], old[2]), (new[0], new[1], new[2])
+
+
+# Note which buckets a flush is about to change
+@event.listens_for(Session, 'before_flush')
+def _collect_rollup_buckets(session, flush_context, instances):
+    buckets = session.info.setdefault('rollup_buckets', set())
+    for obj in session.new:
+        if isinstance(obj, Disaster):
+            buckets.add((obj.start_date, obj.disaster_type_id, obj.state_id))
+    for obj in session.deleted:
+        if isinstance(obj, Disaster):
+            buckets.add((obj.start_date, obj.disaster_type_id, obj.state_id))
+    for obj in session.dirty:
+        if isinstance(obj, Disaster):
+            moved = _bucket_history(obj)
+            if moved:
+                buckets.update(moved)
+
+
+# Recompute those buckets in the same transaction once the rows are written
+@event.listens_for(Session, 'after_flush')
+def _refresh_rollup_buckets(session, flush_context):
+    buckets = session.info.pop('rollup_buckets', None)
+    if buckets:
+        refresh_rollup_buckets(buckets, session.connection())
+
+
+# Start of the bucket a day falls into
+def period_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+# Step from one bucket start to the next
+def next_period(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+# Enumerate the bucket starts covering [start, end)
+def period_starts(start, end, granularity):
+    current = period_start(start, granularity)
+    starts = []
+    while current < end:
+        starts.append(current)
+        current = next_period(current, granularity)
+    return starts
+
+
+# Number of buckets covering [start, end), without enumerating them
+def period_count(start, end, granularity):
+    first = period_start(start, granularity)
+    if end <= first:
+        return 0
+    if granularity == 'week':
+        return ((end - first).days + 6) // 7
+    if granularity == 'month':
+        return (end.year - first.year) * 12 + end.month - first.month + (1 if end.day > 1 else 0)
+    return (end - first).days
+
+
+# Counts and severity sums per bucket, read from the rollup table
+def rollup_series(start, end, granularity='day', disaster_type_id=None, state_id=None):
+    """
+    Args:
+        start, end: [start, end) window as dates or datetimes
+        granularity: 'day', 'week' or 'month'
+        disaster_type_id, state_id: Optional filters
+
+    Returns:
+        Dict mapping each bucket start date to (count, severity_sum),
+        including empty buckets
+    """
+    start, end = _as_date(start), _as_date(end)
+    conditions = [DisasterDailyRollup.day >= start, DisasterDailyRollup.day < end]
+    if disaster_type_id:
+        conditions.append(DisasterDailyRollup.disaster_type_id == disaster_type_id)
+    if state_id:
+        conditions.append(DisasterDailyRollup.state_id == state_id)
+
+    # One row per day at most, whatever the number of underlying events
+    rows = db.session.execute(
+        select(
+            DisasterDailyRollup.day,
+            func.sum(DisasterDailyRollup.disaster_count),
+            func.sum(DisasterDailyRollup.severity_sum)
+        )
+        .where(*conditions)
+        .group_by(DisasterDailyRollup.day)
+    ).all()
+
+    series = {bucket: (0, 0) for bucket in period_starts(start, end, granularity)}
+    for day, count, severity_sum in rows:
+        bucket = period_start(_as_date(day), granularity)
+        total_count, total_severity = series.get(bucket, (0, 0))
+        series[bucket] = (total_count + count, total_severity + severity_sum)
+    return series
@@ -1,9 +1,36 @@
 import os
 import logging
-from flask import render_template, request, jsonify, redirect, url_for
+from flask import render_template, request, jsonify, redirect, url_for, g
 from app import app, db
 from models import Disaster, DisasterType, State, RiskAssessment, DisasterAlert
 from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import contains_eager
+from aggregates import compute_statistics, resolve_period
+from rollups import GRANULARITIES, rollup_series
+from dashboard import get_dashboard_snapshot
+from projections import (
+    disaster_projection, risk_assessment_projection, alert_projection,
+    serialize_disaster, serialize_risk_assessment, serialize_alert, fetch_serialized,
+    disaster_filters, risk_assessment_filters
+)
+from geo import (
+    CLUSTER_MAX_ZOOM, MAX_VIEWPORT_FEATURES, parse_bbox, bbox_conditions,
+    cluster_cell_size, grid_clusters, record_feature, feature_collection
+)
+from nearby import disaster_index, risk_zone_index
+from versioning import current_data_version
+from cache import cached_response, result_cache, response_flight
+from streaming import is_streaming_request, streamed_response
+from pagination import keyset_page, page_limit
+from alert_events import ALERT_STREAM_RETRY_MS, alert_broker, sse_stream
+from run_history import recent_runs
+
+# Alerts shown per page on /alerts
+ALERTS_PAGE_SIZE = 50
+
+# Largest search radius accepted by /api/nearby
+MAX_NEARBY_RADIUS_KM = 500
 
 logger = logging.getLogger(__name__)
 
@@ -12,37 +39,75 @@ logger = logging.getLogger(__name__)
 def now():
     return datetime.utcnow()
 
+# Mark an API view as not derived from the data version (no ETag handling)
+def etag_exempt(view):
+    view.etag_exempt = True
+    return view
+
+# Conditional GET for the JSON API, driven by the data version counter
+def versioned_api_request():
+    if request.method != 'GET' or not request.path.startswith('/api/'):
+        return False
+    view = app.view_functions.get(request.endpoint)
+    return view is not None and not getattr(view, 'etag_exempt', False)
+
+@app.before_request
+def answer_not_modified():
+    """Answer 304 from the data version alone, before the view queries anything"""
+    if not versioned_api_request():
+        return None
+    
+    version, updated_at = current_data_version()
+    # Query arguments are part of the resource URL, so the version identifies the representation
+    g.data_etag = f"v{version}"
+    g.data_last_modified = updated_at.replace(microsecond=0) if updated_at else None
+    
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(g.data_etag)
+    else:
+        not_modified = bool(request.if_modified_since and g.data_last_modified
+                            and g.data_last_modified <= request.if_modified_since.replace(tzinfo=None))
+    
+    if not_modified:
+        response = app.response_class(status=304)
+        return add_version_headers(response)
+    return None
+
+@app.after_request
+def add_version_headers(response):
+    etag = g.get('data_etag')
+    if etag and response.status_code in (200, 304):
+        response.set_etag(etag)
+        if g.get('data_last_modified'):
+            response.last_modified = g.data_last_modified
+        # Clients may keep the body but must revalidate every time
+        response.cache_control.no_cache = True
+    return response
+
+# Parse an optional YYYY-MM-DD query argument
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f"Invalid '{name}' date, expected YYYY-MM-DD")
+
 @app.route('/')
 def index():
     """Home page route"""
-    # Get statistics for the dashboard
-    total_disasters = Disaster.query.count()
-    active_disasters = Disaster.query.filter_by(is_active=True).count()
-    alerts = DisasterAlert.query.filter_by(is_active=True).count()
-    
-    # Get recent disasters
-    recent_disasters = Disaster.query.order_by(Disaster.start_date.desc()).limit(5).all()
-    
-    # Get disaster types for statistics
-    disaster_types = DisasterType.query.all()
-    
-    # Prepare disaster data by type
-    disasters_by_type = {}
-    for dt in disaster_types:
-        count = Disaster.query.filter_by(disaster_type_id=dt.id).count()
-        disasters_by_type[dt.name] = count
-    
-    # Get high risk areas
-    high_risk_areas = RiskAssessment.query.filter(RiskAssessment.risk_level >= 4).limit(5).all()
+    # Render from the precomputed dashboard snapshot (no per-request queries)
+    snapshot = get_dashboard_snapshot()
     
     return render_template('index.html', 
-                           total_disasters=total_disasters,
-                           active_disasters=active_disasters,
-                           alerts=alerts,
-                           recent_disasters=recent_disasters,
-                           disasters_by_type=disasters_by_type,
-                           high_risk_areas=high_risk_areas,
-                           DisasterType=DisasterType)
+                           total_disasters=snapshot['total_disasters'],
+                           active_disasters=snapshot['active_disasters'],
+                           alerts=snapshot['alerts'],
+                           recent_disasters=snapshot['recent_disasters'],
+                           disasters_by_type=snapshot['disasters_by_type'],
+                           high_risk_areas=snapshot['high_risk_areas'],
+                           last_updated=snapshot['built_at'])
 
 @app.route('/map')
 def map_page():
@@ -74,30 +139,40 @@ def alerts_page():
     active_only = request.args.get('active_only', type=bool, default=True)
     
     # Base query - exclude test alerts and check if disasters are actually active
-    query = DisasterAlert.query.join(Disaster).filter(DisasterAlert.is_test == False)
+    query = (
+        select(DisasterAlert)
+        .join(Disaster, DisasterAlert.disaster_id == Disaster.id)
+        .where(DisasterAlert.is_test == False)
+        .options(
+            contains_eager(DisasterAlert.disaster).joinedload(Disaster.type),
+            contains_eager(DisasterAlert.disaster).joinedload(Disaster.state)
+        )
+    )
     
     # Apply filters
     if disaster_type_id:
-        query = query.filter(Disaster.disaster_type_id == disaster_type_id)
+        query = query.where(Disaster.disaster_type_id == disaster_type_id)
     
     if state_id:
-        query = query.filter(Disaster.state_id == state_id)
+        query = query.where(Disaster.state_id == state_id)
     
     if active_only:
         # Make sure both the alert is active and the disaster is still active
-        query = query.filter(DisasterAlert.is_active == True)
-        query = query.filter(Disaster.is_active == True)
-    
-    # Order by issued date
-    alerts = query.order_by(DisasterAlert.issued_at.desc()).all()
-    
-    # If expired alert has a related disaster that's no longer active, 
-    # and that info isn't reflected in the alert, update it
-    for alert in alerts:
-        if alert.is_active and not alert.disaster.is_active:
-            with app.app_context():
-                alert.is_active = False
-                db.session.commit()
+        query = query.where(DisasterAlert.is_active == True)
+        query = query.where(Disaster.is_active == True)
+    
+    # One page at a time, newest first
+    cursor = request.args.get('cursor')
+    try:
+        alerts, next_cursor = keyset_page(query, DisasterAlert.issued_at, DisasterAlert.id,
+                                          cursor, ALERTS_PAGE_SIZE, scalars=True)
+    except ValueError:
+        return redirect(url_for('alerts_page', **{k: v for k, v in request.args.items() if k != 'cursor'}))
+    
+    # Links to the next (older) page and back to the first page
+    filter_args = {k: v for k, v in request.args.items() if k != 'cursor'}
+    next_page_url = url_for('alerts_page', cursor=next_cursor, **filter_args) if next_cursor else None
+    first_page_url = url_for('alerts_page', **filter_args) if cursor else None
     
     return render_template('alerts.html', 
                            alerts=alerts,
@@ -105,7 +180,9 @@ def alerts_page():
                            states=states,
                            selected_disaster_type=disaster_type_id,
                            selected_state=state_id,
-                           active_only=active_only)
+                           active_only=active_only,
+                           next_page_url=next_page_url,
+                           first_page_url=first_page_url)
 
 @app.route('/about')
 def about_page():
@@ -117,8 +194,31 @@ def who_we_are_page():
     """Who We Are page with team information"""
     return render_template('who_we_are.html')
 
+# Serve one keyset page of a projection query, with the next cursor in headers
+def paginated_response(query, sort_col, id_col, serializer):
+    """
+    The body stays a plain JSON list; the token for the following page is
+    returned in the X-Next-Cursor header and as a Link rel="next" URL.
+    Requests without a limit get API_PAGE_SIZE rows; whole-table exports
+    use ?format=ndjson, which streams every row.
+    """
+    limit = page_limit(request.args.get('limit', type=int))
+    try:
+        rows, next_cursor = keyset_page(query, sort_col, id_col, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = jsonify([serializer(row) for row in rows])
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+    return response
+
 # API endpoints for fetching data for the frontend
 @app.route('/api/disasters')
+@cached_response(disaster_type=int, state=int, active_only=bool, cursor=str, limit=int)
 def get_disasters():
     """API endpoint to get disaster data for map"""
     # Get filter parameters
@@ -126,42 +226,18 @@ def get_disasters():
     state_id = request.args.get('state', type=int)
     active_only = request.args.get('active_only', type=bool, default=False)
     
-    # Base query
-    query = Disaster.query
-    
-    # Apply filters
-    if disaster_type_id:
-        query = query.filter_by(disaster_type_id=disaster_type_id)
+    # Single joined projection query (no per-row lazy loads)
+    query = disaster_projection(disaster_type_id, state_id, active_only)
     
-    if state_id:
-        query = query.filter_by(state_id=state_id)
+    # ?format=ndjson or ?format=stream writes rows out as they are read
+    if is_streaming_request():
+        return streamed_response(query, serialize_disaster)
     
-    if active_only:
-        query = query.filter_by(is_active=True)
-    
-    # Get disasters
-    disasters = query.all()
-    
-    # Format data for frontend
-    data = []
-    for disaster in disasters:
-        data.append({
-            'id': disaster.id,
-            'title': disaster.title,
-            'type': disaster.type.name,
-            'state': disaster.state.name,
-            'start_date': disaster.start_date.strftime('%Y-%m-%d'),
-            'end_date': disaster.end_date.strftime('%Y-%m-%d') if disaster.end_date else None,
-            'is_active': disaster.is_active,
-            'severity': disaster.severity,
-            'latitude': disaster.latitude,
-            'longitude': disaster.longitude,
-            'description': disaster.description
-        })
-    
-    return jsonify(data)
+    # Newest first, one keyset page at a time
+    return paginated_response(query, Disaster.start_date, Disaster.id, serialize_disaster)
 
 @app.route('/api/risk_assessments')
+@cached_response(disaster_type=int, state=int, min_risk_level=int)
 def get_risk_assessments():
     """API endpoint to get risk assessment data for map"""
     # Get filter parameters
@@ -169,42 +245,16 @@ def get_risk_assessments():
     state_id = request.args.get('state', type=int)
     min_risk_level = request.args.get('min_risk_level', type=int, default=1)
     
-    # Base query
-    query = RiskAssessment.query
+    # Single joined projection query (no per-row lazy loads)
+    query = risk_assessment_projection(disaster_type_id, state_id, min_risk_level)
     
-    # Apply filters
-    if disaster_type_id:
-        query = query.filter_by(disaster_type_id=disaster_type_id)
+    if is_streaming_request():
+        return streamed_response(query, serialize_risk_assessment)
     
-    if state_id:
-        query = query.filter_by(state_id=state_id)
-    
-    if min_risk_level > 1:
-        query = query.filter(RiskAssessment.risk_level >= min_risk_level)
-    
-    # Get risk assessments
-    assessments = query.all()
-    
-    # Format data for frontend
-    data = []
-    for assessment in assessments:
-        disaster_type = DisasterType.query.get(assessment.disaster_type_id)
-        if disaster_type and assessment.state:
-            data.append({
-                'id': assessment.id,
-                'location_name': assessment.location_name,
-                'disaster_type': disaster_type.name,
-                'state': assessment.state.name,
-                'risk_level': assessment.risk_level,
-                'latitude': assessment.latitude,
-                'longitude': assessment.longitude,
-                'details': assessment.details,
-                'last_assessed': assessment.last_assessed.strftime('%Y-%m-%d')
-            })
-    
-    return jsonify(data)
+    return jsonify(fetch_serialized(query, serialize_risk_assessment))
 
 @app.route('/api/alerts')
+@cached_response(disaster_type=int, state=int, active_only=bool, cursor=str, limit=int)
 def get_alerts():
     """API endpoint to get alert data"""
     # Get filter parameters
@@ -212,95 +262,196 @@ def get_alerts():
     state_id = request.args.get('state', type=int)
     active_only = request.args.get('active_only', type=bool, default=True)
     
-    # Base query
-    query = DisasterAlert.query.join(Disaster)
+    # Single joined projection query, ordered by issued date
+    query = alert_projection(disaster_type_id, state_id, active_only)
     
-    # Apply filters
-    if disaster_type_id:
-        query = query.filter(Disaster.disaster_type_id == disaster_type_id)
+    if is_streaming_request():
+        return streamed_response(query, serialize_alert)
     
-    if state_id:
-        query = query.filter(Disaster.state_id == state_id)
+    return paginated_response(query, DisasterAlert.issued_at, DisasterAlert.id, serialize_alert)
+
+@app.route('/api/geojson')
+@cached_response(layer=str, bbox=str, zoom=int, disaster_type=int, state=int,
+                 active_only=bool, min_risk_level=int)
+def get_geojson():
+    """API endpoint returning map features for the visible viewport"""
+    # Layer, viewport and zoom
+    layer = request.args.get('layer', 'disasters')
+    zoom = request.args.get('zoom', type=int, default=CLUSTER_MAX_ZOOM)
+    try:
+        bbox = parse_bbox(request.args.get('bbox', '-180,-90,180,90'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if active_only:
-        query = query.filter(DisasterAlert.is_active == True)
-    
-    # Order by issued date
-    alerts = query.order_by(DisasterAlert.issued_at.desc()).all()
-    
-    # Format data for frontend
-    data = []
-    for alert in alerts:
-        disaster = alert.disaster
-        if disaster and disaster.type and disaster.state:
-            data.append({
-                'id': alert.id,
-                'title': alert.title,
-                'message': alert.message,
-                'alert_level': alert.alert_level,
-                'issued_at': alert.issued_at.strftime('%Y-%m-%d %H:%M'),
-                'expires_at': alert.expires_at.strftime('%Y-%m-%d %H:%M') if alert.expires_at else None,
-                'is_active': alert.is_active,
-                'disaster': {
-                    'id': disaster.id,
-                    'title': disaster.title,
-                    'type': disaster.type.name,
-                    'state': disaster.state.name,
-                    'latitude': disaster.latitude,
-                    'longitude': disaster.longitude
-                }
-            })
-    
-    return jsonify(data)
+    # Get filter parameters
+    disaster_type_id = request.args.get('disaster_type', type=int)
+    state_id = request.args.get('state', type=int)
+    
+    if layer == 'disasters':
+        active_only = request.args.get('active_only', type=bool, default=False)
+        model, value_col = Disaster, Disaster.severity
+        conditions = disaster_filters(disaster_type_id, state_id, active_only)
+        query = disaster_projection(disaster_type_id, state_id, active_only)
+        serializer = serialize_disaster
+    elif layer == 'risk_assessments':
+        min_risk_level = request.args.get('min_risk_level', type=int, default=1)
+        model, value_col = RiskAssessment, RiskAssessment.risk_level
+        conditions = risk_assessment_filters(disaster_type_id, state_id, min_risk_level)
+        query = risk_assessment_projection(disaster_type_id, state_id, min_risk_level)
+        serializer = serialize_risk_assessment
+    else:
+        return jsonify({'error': "Invalid 'layer', expected disasters or risk_assessments"}), 400
+    
+    viewport = bbox_conditions(model.latitude, model.longitude, bbox, model.geohash)
+    
+    # Low zoom: aggregate into grid clusters on the server
+    if zoom < CLUSTER_MAX_ZOOM:
+        features = grid_clusters(model.latitude, model.longitude, value_col,
+                                 conditions + viewport, cluster_cell_size(zoom))
+        return jsonify(feature_collection(features, layer=layer, zoom=zoom, clustered=True))
+    
+    # High zoom: individual features inside the viewport, capped
+    rows = db.session.execute(query.where(*viewport).limit(MAX_VIEWPORT_FEATURES + 1)).all()
+    truncated = len(rows) > MAX_VIEWPORT_FEATURES
+    features = [record_feature(serializer(row)) for row in rows[:MAX_VIEWPORT_FEATURES]]
+    
+    return jsonify(feature_collection(features, layer=layer, zoom=zoom, clustered=False, truncated=truncated))
+
+@app.route('/api/alerts/stream')
+@etag_exempt
+def stream_alerts():
+    """Server-Sent Events stream of created, updated and expired alerts"""
+    # EventSource resends the id of the last event it received when reconnecting
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id is not None:
+        try:
+            last_event_id = int(last_event_id)
+        except ValueError:
+            return jsonify({'error': "Invalid 'last_event_id'"}), 400
+    
+    subscriber, backlog = alert_broker.subscribe(last_event_id)
+    if subscriber is None:
+        # Every stream holds a worker thread; refuse rather than starve other requests
+        # The page script backs off and reconnects, resuming from its last event id
+        return (jsonify({'error': 'Too many alert stream clients, try again later'}), 503,
+                {'Retry-After': str(ALERT_STREAM_RETRY_MS // 1000)})
+    return app.response_class(sse_stream(subscriber, backlog),
+                              mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/nearby')
+def get_nearby():
+    """API endpoint returning active disasters and risk zones near a location"""
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    radius_km = request.args.get('radius_km', type=float, default=50.0)
+    limit = request.args.get('limit', type=int, default=50)
+    min_risk_level = request.args.get('min_risk_level', type=int, default=1)
+    
+    if lat is None or lon is None or not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        return jsonify({'error': "Valid 'lat' and 'lon' parameters are required"}), 400
+    
+    if not (0 < radius_km <= MAX_NEARBY_RADIUS_KM):
+        return jsonify({'error': f"'radius_km' must be between 0 and {MAX_NEARBY_RADIUS_KM}"}), 400
+    
+    limit = max(1, min(limit, 500))
+    
+    # Answered from the in-memory haversine indexes, nearest first
+    disasters = [dict(record, distance_km=round(distance, 3))
+                 for distance, record in disaster_index.query(lat, lon, radius_km, limit)]
+    risk_zones = [dict(record, distance_km=round(distance, 3))
+                  for distance, record in risk_zone_index.query(lat, lon, radius_km)
+                  if record['risk_level'] >= min_risk_level][:limit]
+    
+    return jsonify({
+        'latitude': lat,
+        'longitude': lon,
+        'radius_km': radius_km,
+        'disasters': disasters,
+        'risk_zones': risk_zones
+    })
 
 @app.route('/api/statistics')
+@cached_response(year=int, **{'from': str, 'to': str})
 def get_statistics():
     """API endpoint to get statistics for charts"""
-    # Get disasters by type
-    disaster_types = DisasterType.query.all()
-    disasters_by_type = {}
-    for dt in disaster_types:
-        count = Disaster.query.filter_by(disaster_type_id=dt.id).count()
-        disasters_by_type[dt.name] = count
-    
-    # Get disasters by state
-    states = State.query.all()
-    disasters_by_state = {}
-    for state in states:
-        count = Disaster.query.filter_by(state_id=state.id).count()
-        disasters_by_state[state.name] = count
-    
-    # Get disasters by month (for the current year)
-    current_year = datetime.now().year
-    start_of_year = datetime(current_year, 1, 1)
-    disasters_by_month = {}
-    for month in range(1, 13):
-        month_start = datetime(current_year, month, 1)
-        if month == 12:
-            month_end = datetime(current_year+1, 1, 1) - timedelta(days=1)
-        else:
-            month_end = datetime(current_year, month+1, 1) - timedelta(days=1)
-        
-        count = Disaster.query.filter(
-            Disaster.start_date >= month_start,
-            Disaster.start_date <= month_end
-        ).count()
-        
-        month_name = month_start.strftime('%b')
-        disasters_by_month[month_name] = count
-    
-    # Get risk assessment distribution
-    risk_levels = {}
-    for level in range(1, 6):
-        count = RiskAssessment.query.filter_by(risk_level=level).count()
-        risk_levels[f"Level {level}"] = count
+    # Optional reporting period (defaults to the current year for monthly data)
+    year = request.args.get('year', type=int)
+    try:
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if date_from and date_to and date_from > date_to:
+        return jsonify({'error': "'from' must not be after 'to'"}), 400
+    
+    try:
+        period = resolve_period(year, date_from, date_to)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(compute_statistics(*period))
+
+@app.route('/api/timeseries')
+@cached_response(granularity=str, year=int, disaster_type=int, state=int, **{'from': str, 'to': str})
+def get_timeseries():
+    """API endpoint for disaster counts over time from the daily rollups"""
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"'granularity' must be one of: {', '.join(GRANULARITIES)}"}), 400
+    
+    year = request.args.get('year', type=int)
+    try:
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if date_from and date_to and date_from > date_to:
+        return jsonify({'error': "'from' must not be after 'to'"}), 400
+    
+    # Same period rules as /api/statistics (current year by default)
+    try:
+        start, end, _ = resolve_period(year, date_from, date_to, granularity)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    series = rollup_series(start, end, granularity,
+                           disaster_type_id=request.args.get('disaster_type', type=int),
+                           state_id=request.args.get('state', type=int))
     
     return jsonify({
-        'disasters_by_type': disasters_by_type,
-        'disasters_by_state': disasters_by_state,
-        'disasters_by_month': disasters_by_month,
-        'risk_levels': risk_levels,
-        'total_disasters': Disaster.query.count(),
-        'active_disasters': Disaster.query.filter_by(is_active=True).count(),
-        'active_alerts': DisasterAlert.query.filter_by(is_active=True).count()
+        'granularity': granularity,
+        # isoformat() zero-pads years before 1000, strftime('%Y') does not
+        'from': start.date().isoformat(),
+        'to': (end - timedelta(days=1)).date().isoformat(),
+        'buckets': [{
+            'period': bucket.isoformat()[:7] if granularity == 'month' else bucket.isoformat(),
+            'count': count,
+            'severity_sum': severity_sum,
+            'average_severity': round(severity_sum / count, 2) if count else None
+        } for bucket, (count, severity_sum) in series.items()]
     })
+
+@app.route('/api/cache/stats')
+@etag_exempt
+def get_cache_stats():
+    """API endpoint exposing this worker's result cache counters"""
+    stats = result_cache.stats()
+    stats['coalescing'] = response_flight.stats()
+    return jsonify(stats)
+
+@app.route('/api/collection_runs')
+@etag_exempt
+def get_collection_runs():
+    """API endpoint for the most recent data collection runs and their stage timings"""
+    limit = request.args.get('limit', type=int, default=20)
+    return jsonify({'runs': recent_runs(max(1, min(limit, 200)))})
+
+@app.route('/api/http/stats')
+@etag_exempt
+def get_http_stats():
+    """API endpoint exposing this worker's outbound request latencies per host"""
+    from http_client import http_client  # Web workers rarely make outbound calls; load requests on demand
+    return jsonify(http_client.stats())
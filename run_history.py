@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from app import app, db
+from models import CollectionRun
+
+logger = logging.getLogger(__name__)
+
+# Runs older than this are pruned from the history
+RUN_HISTORY_RETENTION_DAYS = int(os.environ.get("RUN_HISTORY_RETENTION_DAYS", 90))
+
+# Stages of a collection run, in order
+RUN_STAGES = ('fetch', 'parse', 'save', 'train', 'assess')
+
+
+class RunRecorder:
+    """
+    Durations and row counts of one collection run, stored in the
+    collection_run table when the run starts and again when it ends.
+
+    Stages that run per source on worker threads (fetch, parse) add up
+    the time of every source and also keep each source's own time, so
+    seconds can exceed the run's wall-clock duration.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.run_id = None
+        self._began = None
+
+    def start(self):
+        self._began = time.perf_counter()
+        with app.app_context():
+            try:
+                run = CollectionRun(started_at=datetime.utcnow(), status='running')
+                db.session.add(run)
+                db.session.commit()
+                self.run_id = run.id
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error recording collection run start: {str(e)}")
+        return self
+
+    def add(self, stage, seconds=0.0, rows=0, source=None):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {'seconds': 0.0, 'rows': 0})
+            entry['seconds'] += seconds
+            entry['rows'] += rows
+            if source is not None:
+                by_source = entry.setdefault('sources', {})
+                by_source[source] = by_source.get(source, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block; the block may set rows on the yielded dict"""
+        counts = {'rows': 0}
+        began = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.add(name, time.perf_counter() - began, counts['rows'])
+
+    def finish(self, status, error=None, sources=None):
+        duration = time.perf_counter() - self._began if self._began else None
+        stages = {}
+        with self._lock:
+            order = lambda name: RUN_STAGES.index(name) if name in RUN_STAGES else len(RUN_STAGES)
+            for name in sorted(self.stages, key=order):
+                entry = self.stages[name]
+                stages[name] = {'seconds': round(entry['seconds'], 3), 'rows': entry['rows']}
+                if 'sources' in entry:
+                    stages[name]['sources'] = {source: round(seconds, 3) for source, seconds in entry['sources'].items()}
+
+        summary = ", ".join(f"{name} {entry['seconds']:.2f}s/{entry['rows']} rows" for name, entry in stages.items())
+        logger.info(f"Collection run {status} in {duration or 0:.2f}s - {summary}")
+
+        if self.run_id is None:
+            return
+        with app.app_context():
+            try:
+                run = db.session.get(CollectionRun, self.run_id)
+                run.finished_at = datetime.utcnow()
+                run.status = status
+                run.error = error
+                run.duration_seconds = round(duration, 3) if duration is not None else None
+                run.stages = json.dumps(stages)
+                run.sources = json.dumps(sources or {})
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error recording collection run {self.run_id}: {str(e)}")
+
+
+# JSON shape of a run for the API
+def serialize_run(run):
+    return {
+        'id': run.id,
+        'started_at': run.started_at.isoformat(),
+        'finished_at': run.finished_at.isoformat() if run.finished_at else None,
+        'status': run.status,
+        'error': run.error,
+        'duration_seconds': run.duration_seconds,
+        'stages': json.loads(run.stages) if run.stages else {},
+        'sources': json.loads(run.sources) if run.sources else {}
+    }
+
+
+# Most recent runs, newest first
+def recent_runs(limit=20):
+    runs = db.session.execute(
+        select(CollectionRun).order_by(CollectionRun.started_at.desc(), CollectionRun.id.desc()).limit(limit)
+    ).scalars()
+    return [serialize_run(run) for run in runs]
+
+
+# Drop runs past the retention window
+def prune_run_history():
+    with app.app_context():
+        cutoff = datetime.utcnow() - timedelta(days=RUN_HISTORY_RETENTION_DAYS)
+        try:
+            deleted = db.session.execute(delete(CollectionRun).where(CollectionRun.started_at < cutoff)).rowcount
+            db.session.commit()
+            if deleted:
+                logger.info(f"Pruned {deleted} collection runs older than {RUN_HISTORY_RETENTION_DAYS} days")
+            return deleted
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error pruning collection runs: {str(e)}")
+            return 0
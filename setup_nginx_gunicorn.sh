@@ -17,16 +17,36 @@ After=network.target
 User=$USER
 Group=www-data
 WorkingDirectory=/workspaces/disas4
-ExecStart=/usr/bin/gunicorn --workers 4 --bind 127.0.0.1:8000 main:app
+# Keep the alert stream limit below --threads so streams leave threads for other requests
+Environment=ALERT_STREAM_MAX_CLIENTS=24
+ExecStart=/usr/bin/gunicorn --workers 4 --worker-class gthread --threads 32 --bind 127.0.0.1:8000 main:app
 
 [Install]
 WantedBy=multi-user.target
 EOF'
 
-# Reload systemd and start Gunicorn service
+# Create the data collector systemd service file (runs the scheduled jobs;
+# the web workers never do)
+sudo bash -c 'cat > /etc/systemd/system/disas4-collector.service <<EOF
+[Unit]
+Description=Data collector for disas4
+After=network.target
+
+[Service]
+User=$USER
+Group=www-data
+WorkingDirectory=/workspaces/disas4
+ExecStart=/usr/bin/python3 collector.py
+Restart=always
+
+[Install]
+WantedBy=multi-user.target
+EOF'
+
+# Reload systemd and start the Gunicorn and collector services
 sudo systemctl daemon-reload
-sudo systemctl start disas4
-sudo systemctl enable disas4
+sudo systemctl start disas4 disas4-collector
+sudo systemctl enable disas4 disas4-collector
 
 # Create Nginx configuration file
 sudo bash -c 'cat > /etc/nginx/sites-available/disas4 <<EOF
@@ -0,0 +1,218 @@
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+# Total time a source may take to fetch and parse, retries included
+SOURCE_TIMEOUT_SECONDS = float(os.environ.get("SOURCE_TIMEOUT_SECONDS", 60))
+
+# Extra fetch attempts after a failure, and the base of the jittered backoff between them
+SOURCE_RETRIES = int(os.environ.get("SOURCE_RETRIES", 2))
+SOURCE_RETRY_BACKOFF_SECONDS = 1.0
+
+# Consecutive failed runs that open a source's breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", 3))
+BREAKER_RESET_SECONDS = int(os.environ.get("BREAKER_RESET_SECONDS", 30 * 60))
+
+# Time a worker gets past its source's own deadline before it is abandoned
+SOURCE_DEADLINE_GRACE_SECONDS = 5
+
+# Sources fetched at the same time
+COLLECTION_WORKERS = int(os.environ.get("COLLECTION_WORKERS", 8))
+
+
+class CircuitBreaker:
+    """
+    Skip a source after repeated failures.
+
+    After BREAKER_FAILURE_THRESHOLD failed runs in a row the breaker opens
+    and the source is skipped until BREAKER_RESET_SECONDS have passed;
+    the next run is then a trial that closes the breaker on success or
+    opens it again on failure.
+    """
+
+    def __init__(self, threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        return self.state != 'open'
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class Batch:
+    """Parsed events of one source, and a callback to run once they are stored"""
+
+    def __init__(self, events, on_saved=None):
+        self.events = events
+        self.on_saved = on_saved
+
+
+class Source:
+    """
+    An external data source as a fetch and a parse stage.
+
+    fetch(timeout) downloads the raw payload within the given number of
+    seconds and returns None when there is nothing new; it is retried with
+    jittered exponential backoff. parse(payload) turns the payload into a
+    Batch of events in the shape save_events_to_database expects. Both
+    run on a worker thread and must not write to the database themselves;
+    anything that should happen only after the events are stored (such as
+    advancing a sync watermark) goes in Batch.on_saved, which the writer
+    runs even when the batch has no events.
+    """
+
+    def __init__(self, name, fetch, parse, timeout=SOURCE_TIMEOUT_SECONDS, retries=SOURCE_RETRIES):
+        self.name = name
+        self.fetch = fetch
+        self.parse = parse
+        self.timeout = timeout
+        self.retries = retries
+        self.breaker = CircuitBreaker()
+
+    def run(self, recorder=None):
+        deadline = time.monotonic() + self.timeout
+        began = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"{self.name} timed out after {self.timeout:g}s")
+                try:
+                    payload = self.fetch(remaining)
+                    break
+                except Exception as e:
+                    if attempt == self.retries:
+                        raise
+                    delay = SOURCE_RETRY_BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+                    logger.warning(f"Fetching {self.name} failed ({str(e)}), retrying in {delay:.1f}s")
+                    time.sleep(min(delay, max(0, deadline - time.monotonic())))
+        finally:
+            if recorder:
+                recorder.add('fetch', time.perf_counter() - began, source=self.name)
+
+        if payload is None:
+            return None
+
+        began = time.perf_counter()
+        batch = self.parse(payload)
+        if recorder:
+            recorder.add('parse', time.perf_counter() - began, len(batch.events) if batch else 0, source=self.name)
+        return batch
+
+
+_sources = {}
+
+
+# Add a source to the registry (replacing one with the same name)
+def register_source(source):
+    _sources[source.name] = source
+    return source
+
+
+def registered_sources():
+    return list(_sources.values())
+
+
+# Fetch every source concurrently and hand their batches to a single writer
+def collect_sources(write, sources=None, workers=COLLECTION_WORKERS, recorder=None):
+    """
+    Fetch and parse the sources on a thread pool and write each batch on
+    the calling thread as soon as it is ready, so the database sees one
+    writer and the whole run takes about as long as the slowest source.
+
+    Args:
+        write: Called with the events of each non-empty batch
+        sources: Sources to collect (default: all registered ones)
+        workers: Thread pool size
+        recorder: Optional run_history.RunRecorder for stage timings;
+            write should return a dict with inserted and updated counts
+
+    Returns:
+        Dict of source name -> True if it was fetched and written
+    """
+    sources = registered_sources() if sources is None else sources
+    results = {}
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(sources))),
+                                  thread_name_prefix='source')
+    futures, deadlines = {}, {}
+    for source in sources:
+        if not source.breaker.allow():
+            logger.warning(f"Skipping {source.name}: circuit open after {source.breaker.failures} failures")
+            results[source.name] = False
+            continue
+        future = executor.submit(source.run, recorder)
+        futures[future] = source
+        deadlines[future] = time.monotonic() + source.timeout + SOURCE_DEADLINE_GRACE_SECONDS
+
+    try:
+        pending = set(futures)
+        while pending:
+            timeout = max(0, min(deadlines[future] for future in pending) - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                source = futures[future]
+                try:
+                    batch = future.result()
+                except Exception as e:
+                    logger.error(f"Error collecting {source.name}: {str(e)}")
+                    source.breaker.record_failure()
+                    results[source.name] = False
+                    continue
+                source.breaker.record_success()
+
+                try:
+                    if batch is not None:
+                        if batch.events:
+                            began = time.perf_counter()
+                            saved = write(batch.events)
+                            if recorder:
+                                rows = saved['inserted'] + saved['updated'] if isinstance(saved, dict) else 0
+                                recorder.add('save', time.perf_counter() - began, rows, source=source.name)
+                        if batch.on_saved:
+                            batch.on_saved()
+                    results[source.name] = True
+                except Exception as e:
+                    # A database problem, not the source's fault: leave its breaker alone
+                    logger.error(f"Error saving {source.name} events: {str(e)}")
+                    results[source.name] = False
+
+            # Workers stuck past their deadline are abandoned, not waited for
+            now = time.monotonic()
+            for future in [future for future in pending if deadlines[future] <= now]:
+                source = futures[future]
+                logger.error(f"Error collecting {source.name}: no result after {source.timeout:g}s")
+                source.breaker.record_failure()
+                results[source.name] = False
+                pending.discard(future)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
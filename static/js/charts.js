@@ -18,7 +18,15 @@ function initCharts() {
 // Fetch statistics data from API
 async function fetchStatistics() {
     try {
-        const response = await fetch('/api/statistics');
+        // Pass through an optional reporting period (year, from, to) from the page URL
+        const pageParams = new URLSearchParams(window.location.search);
+        let params = new URLSearchParams();
+        ['year', 'from', 'to'].forEach(name => {
+            if (pageParams.get(name)) params.append(name, pageParams.get(name));
+        });
+        
+        const query = params.toString();
+        const response = await fetch(query ? `/api/statistics?${query}` : '/api/statistics');
         if (!response.ok) {
             throw new Error(`HTTP error! Status: ${response.status}`);
         }
@@ -165,10 +173,28 @@ function createDisasterMonthChart(data) {
     const monthOrder = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
                          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
     
+    // Periods spanning several years use "Mon YYYY" labels
+    const pageParams = new URLSearchParams(window.location.search);
+    const hasPeriod = ['year', 'from', 'to'].some(name => pageParams.get(name));
+    const multiYear = Object.keys(data).some(label => label.includes(' '));
+    
     const orderedData = {};
-    monthOrder.forEach(month => {
-        orderedData[month] = data[month] || 0;
-    });
+    if (multiYear) {
+        // Keys arrive sorted alphabetically, so order them chronologically
+        const monthIndex = label => {
+            const [month, year] = label.split(' ');
+            return parseInt(year, 10) * 12 + monthOrder.indexOf(month);
+        };
+        Object.keys(data)
+            .sort((a, b) => monthIndex(a) - monthIndex(b))
+            .forEach(label => {
+                orderedData[label] = data[label];
+            });
+    } else {
+        monthOrder.forEach(month => {
+            if (month in data) orderedData[month] = data[month];
+        });
+    }
     
     const labels = Object.keys(orderedData);
     const values = Object.values(orderedData);
@@ -196,7 +222,7 @@ function createDisasterMonthChart(data) {
                 },
                 title: {
                     display: true,
-                    text: 'Disasters by Month (Current Year)',
+                    text: hasPeriod ? 'Disasters by Month (Selected Period)' : 'Disasters by Month (Current Year)',
                     color: '#fff',
                     font: {
                         size: 16
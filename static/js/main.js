@@ -38,12 +38,78 @@ function setupAlertFilters() {
             url.searchParams.set('state', state || '');
             url.searchParams.set('active_only', activeOnly);
             
+            // A page cursor only applies to the filters it was issued for
+            url.searchParams.delete('cursor');
+            
             // Navigate to the filtered page
             window.location.href = url.toString();
         });
     }
 }
 
+// Notify the alerts page about alert changes pushed by the server
+function subscribeToAlertStream() {
+    // Only the alerts page listens; other pages render their own snapshots
+    if (!document.getElementById('alert-filter-form') || !window.EventSource) return;
+    
+    // Alert text comes from external sources, so never inject it as HTML
+    const escapeText = (text) => {
+        const span = document.createElement('span');
+        span.textContent = text;
+        return span.innerHTML;
+    };
+    
+    const initialRetryDelay = 5000;
+    const maxRetryDelay = 5 * 60 * 1000;
+    let retryDelay = initialRetryDelay;
+    let lastEventId = null;
+    let source = null;
+    
+    const connect = () => {
+        // A new EventSource does not send Last-Event-ID, so resume through the query string
+        const url = lastEventId
+            ? `/api/alerts/stream?last_event_id=${encodeURIComponent(lastEventId)}`
+            : '/api/alerts/stream';
+        source = new EventSource(url);
+        
+        source.addEventListener('open', function() {
+            retryDelay = initialRetryDelay;
+        });
+        
+        source.addEventListener('alert.created', function(event) {
+            lastEventId = event.lastEventId;
+            const alert = JSON.parse(event.data);
+            showAlert(`New alert: <strong>${escapeText(alert.title)}</strong> (${escapeText(alert.disaster.state)}). <a href="${window.location.pathname}${window.location.search}" class="alert-link">Refresh</a> to see it in the list.`, 'warning');
+        });
+        
+        source.addEventListener('alert.updated', function(event) {
+            lastEventId = event.lastEventId;
+        });
+        
+        source.addEventListener('alert.expired', function(event) {
+            lastEventId = event.lastEventId;
+            const alert = JSON.parse(event.data);
+            showAlert(`Alert expired: ${escapeText(alert.title)}`, 'info');
+        });
+        
+        source.addEventListener('error', function() {
+            // EventSource reconnects after a dropped connection by itself, but gives
+            // up for good after an error response (such as a 503 when the server is
+            // at its stream limit); back off with jitter and open a new one
+            if (source.readyState !== EventSource.CLOSED) return;
+            const delay = retryDelay * (0.5 + Math.random());
+            retryDelay = Math.min(retryDelay * 2, maxRetryDelay);
+            setTimeout(connect, delay);
+        });
+    };
+    
+    connect();
+    
+    window.addEventListener('beforeunload', function() {
+        source.close();
+    });
+}
+
 // Show alert message
 function showAlert(message, type = 'info') {
     const alertPlaceholder = document.getElementById('alert-placeholder');
@@ -127,6 +193,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Setup event handlers
     setupAlertFilters();
     setupRefreshButton();
+    subscribeToAlertStream();
     
     // Setup theme toggle button
     const themeToggleBtn = document.getElementById('theme-toggle');
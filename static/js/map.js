@@ -89,7 +89,48 @@ function addLegend() {
     legend.addTo(map);
 }
 
-// Load disaster data from API
+// Add the current viewport (bbox and zoom) to a set of query parameters
+function addViewportParams(params) {
+    params.append('bbox', map.getBounds().toBBoxString());
+    params.append('zoom', map.getZoom());
+    return params;
+}
+
+// Create a cluster marker for an aggregated GeoJSON feature
+function createClusterMarker(feature) {
+    const [lng, lat] = feature.geometry.coordinates;
+    const props = feature.properties;
+    const size = Math.min(60, 24 + Math.round(Math.log2(props.point_count + 1) * 6));
+    
+    const marker = L.marker([lat, lng], {
+        title: `${props.point_count} items`,
+        icon: L.divIcon({
+            html: `<div class="map-cluster" style="background-color: ${riskColors[props.max_level] || '#6c757d'}; width: ${size}px; height: ${size}px; line-height: ${size}px;">${props.point_count}</div>`,
+            className: 'map-cluster-marker',
+            iconSize: [size, size],
+            iconAnchor: [size / 2, size / 2]
+        })
+    });
+    
+    // Zoom into the cluster on click
+    marker.on('click', () => {
+        map.setView([lat, lng], Math.min(map.getZoom() + 2, map.getMaxZoom()));
+    });
+    
+    return marker;
+}
+
+// Convert a GeoJSON feature back into the flat record used by the popups
+function featureToRecord(feature) {
+    const [lng, lat] = feature.geometry.coordinates;
+    return Object.assign({}, feature.properties, { latitude: lat, longitude: lng });
+}
+
+// Pending viewport requests, aborted when the map moves again
+let disasterRequest = null;
+let riskZoneRequest = null;
+
+// Load disaster data for the visible viewport from API
 function loadDisasters() {
     // Get filter values
     const disasterType = document.getElementById('disaster-type-filter')?.value || '';
@@ -100,21 +141,27 @@ function loadDisasters() {
     document.getElementById('map-loading').classList.remove('d-none');
     
     // Build query parameters
-    let params = new URLSearchParams();
+    let params = new URLSearchParams({ layer: 'disasters' });
     if (disasterType) params.append('disaster_type', disasterType);
     if (state) params.append('state', state);
     if (activeOnly) params.append('active_only', 'true');
+    addViewportParams(params);
     
-    // Fetch disaster data
-    fetch(`/api/disasters?${params.toString()}`)
+    if (disasterRequest) disasterRequest.abort();
+    disasterRequest = new AbortController();
+    
+    // Fetch disaster features (clusters at low zoom, points at high zoom)
+    fetch(`/api/geojson?${params.toString()}`, { signal: disasterRequest.signal })
         .then(response => response.json())
         .then(data => {
             // Clear existing markers
             disasterMarkers.clearLayers();
             
             // Add new markers
-            data.forEach(disaster => {
-                const marker = createDisasterMarker(disaster);
+            data.features.forEach(feature => {
+                const marker = feature.properties.cluster
+                    ? createClusterMarker(feature)
+                    : createDisasterMarker(featureToRecord(feature));
                 disasterMarkers.addLayer(marker);
             });
             
@@ -122,6 +169,7 @@ function loadDisasters() {
             document.getElementById('map-loading').classList.add('d-none');
         })
         .catch(error => {
+            if (error.name === 'AbortError') return;
             console.error('Error loading disaster data:', error);
             // Hide loading indicator
             document.getElementById('map-loading').classList.add('d-none');
@@ -164,7 +212,7 @@ function createDisasterMarker(disaster) {
     return marker;
 }
 
-// Load risk assessment zones
+// Load risk assessment zones for the visible viewport
 function loadRiskZones() {
     // Get filter values
     const disasterType = document.getElementById('disaster-type-filter')?.value || '';
@@ -172,25 +220,32 @@ function loadRiskZones() {
     const minRiskLevel = document.getElementById('min-risk-filter')?.value || 1;
     
     // Build query parameters
-    let params = new URLSearchParams();
+    let params = new URLSearchParams({ layer: 'risk_assessments' });
     if (disasterType) params.append('disaster_type', disasterType);
     if (state) params.append('state', state);
     if (minRiskLevel > 1) params.append('min_risk_level', minRiskLevel);
+    addViewportParams(params);
+    
+    if (riskZoneRequest) riskZoneRequest.abort();
+    riskZoneRequest = new AbortController();
     
-    // Fetch risk assessment data
-    fetch(`/api/risk_assessments?${params.toString()}`)
+    // Fetch risk assessment features
+    fetch(`/api/geojson?${params.toString()}`, { signal: riskZoneRequest.signal })
         .then(response => response.json())
         .then(data => {
             // Clear existing zones
             riskZones.clearLayers();
             
             // Add new zones
-            data.forEach(assessment => {
-                const circle = createRiskZone(assessment);
-                riskZones.addLayer(circle);
+            data.features.forEach(feature => {
+                const layer = feature.properties.cluster
+                    ? createClusterMarker(feature)
+                    : createRiskZone(featureToRecord(feature));
+                riskZones.addLayer(layer);
             });
         })
         .catch(error => {
+            if (error.name === 'AbortError') return;
             console.error('Error loading risk zones:', error);
             showAlert('Error loading risk zone data. Please try again.', 'danger');
         });
@@ -236,6 +291,12 @@ function setupEventListeners() {
         });
     });
     
+    // Reload features for the new viewport after panning or zooming
+    map.on('moveend', () => {
+        loadDisasters();
+        loadRiskZones();
+    });
+    
     // Layer toggle handlers
     document.getElementById('toggle-disasters')?.addEventListener('change', function() {
         if (this.checked) {
@@ -0,0 +1,78 @@
+import os
+import logging
+from flask import request, stream_with_context
+from app import app, db
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip when streaming (server-side cursor on PostgreSQL)
+STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE", 1000))
+
+# Supported ?format= values: newline-delimited JSON and a chunked JSON array
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'stream': 'application/json'
+}
+
+
+# Whether the current request asked for a streamed response
+def is_streaming_request():
+    return request.args.get('format') in STREAM_FORMATS
+
+
+# Serialize rows batch by batch without materializing the result set
+def iter_serialized(query, serializer, batch_size=STREAM_BATCH_SIZE):
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    try:
+        for row in result:
+            yield serializer(row)
+    finally:
+        result.close()
+
+
+def _ndjson_chunks(records, batch_size):
+    # One write per batch of lines rather than one per record
+    chunk = []
+    for record in records:
+        chunk.append(app.json.dumps(record) + '\n')
+        if len(chunk) >= batch_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _json_array_chunks(records, batch_size):
+    # Emit the array in chunks of batch_size records to keep writes efficient
+    yield '['
+    first = True
+    chunk = []
+    for record in records:
+        chunk.append(app.json.dumps(record))
+        if len(chunk) >= batch_size:
+            yield ('' if first else ',') + ','.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield ('' if first else ',') + ','.join(chunk)
+    yield ']'
+
+
+# Build a streamed response for a projection query in the requested format
+def streamed_response(query, serializer, batch_size=STREAM_BATCH_SIZE):
+    """
+    Stream a query's serialized rows as NDJSON (?format=ndjson) or as a
+    chunked JSON array (?format=stream). Memory stays flat because rows
+    are read in batches and written out as they are serialized.
+    """
+    output_format = request.args.get('format')
+    records = iter_serialized(query, serializer, batch_size)
+
+    # Flush to the client every tenth of a fetch batch
+    write_size = max(1, batch_size // 10)
+    if output_format == 'ndjson':
+        chunks = _ndjson_chunks(records, write_size)
+    else:
+        chunks = _json_array_chunks(records, write_size)
+
+    return app.response_class(stream_with_context(chunks), mimetype=STREAM_FORMATS[output_format])
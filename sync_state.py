@@ -0,0 +1,56 @@
+import logging
+from datetime import datetime
+from app import app, db
+from models import SyncState
+
+logger = logging.getLogger(__name__)
+
+_SYNC_FIELDS = ('etag', 'last_modified', 'newest_event_at', 'last_success_at', 'last_attempt_at')
+
+
+# Current sync position of a source as a plain dict (all None before the first sync)
+def load_sync_state(source):
+    with app.app_context():
+        state = db.session.get(SyncState, source)
+        return {field: getattr(state, field) if state else None for field in _SYNC_FIELDS}
+
+
+# Update the stored sync position of a source
+def save_sync_state(source, **fields):
+    unknown = set(fields) - set(_SYNC_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown sync state fields: {', '.join(sorted(unknown))}")
+
+    with app.app_context():
+        try:
+            state = db.session.get(SyncState, source) or SyncState(source=source)
+            for field, value in fields.items():
+                setattr(state, field, value)
+            db.session.add(state)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error saving sync state for {source}: {str(e)}")
+
+
+# Record a successful fetch, keeping the watermark from moving backwards
+def record_sync_success(source, headers=None, newest_event_at=None, attempted_at=None):
+    """
+    Args:
+        source: Sync state key
+        headers: Headers of a 200 response, whose validators replace the
+            stored ones (None after a 304, which keeps them)
+        newest_event_at: Newest event date in the response (naive UTC)
+        attempted_at: When the request was sent (default: now)
+    """
+    previous = load_sync_state(source)
+    if previous['newest_event_at'] and (newest_event_at is None or newest_event_at < previous['newest_event_at']):
+        newest_event_at = previous['newest_event_at']
+
+    fields = {'newest_event_at': newest_event_at}
+    if headers is not None:
+        fields['etag'] = headers.get('ETag')
+        fields['last_modified'] = headers.get('Last-Modified')
+
+    now = datetime.utcnow()
+    save_sync_state(source, last_success_at=now, last_attempt_at=attempted_at or now, **fields)
@@ -0,0 +1,141 @@
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from app import db
+from models import Disaster
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the database per chunk
+TRAINING_CHUNK_SIZE = int(os.environ.get("TRAINING_CHUNK_SIZE", 50000))
+
+# Optional .npz snapshot of the training columns; later loads only read
+# rows added or updated since it was written. Empty disables it.
+TRAINING_SNAPSHOT_PATH = os.environ.get("TRAINING_SNAPSHOT_PATH", "")
+
+# Columns read for model training and the array type of each. Severity is
+# a float so unknown values can be NaN; id and updated_at are only kept
+# for the snapshot and are not part of the returned frame.
+TRAINING_COLUMNS = (
+    ('id', np.int64),
+    ('disaster_type_id', np.int32),
+    ('state_id', np.int32),
+    ('latitude', np.float64),
+    ('longitude', np.float64),
+    ('severity', np.float32),
+    ('start_date', 'datetime64[ns]'),
+    ('is_active', np.bool_),
+    ('updated_at', 'datetime64[ns]'),
+)
+_SNAPSHOT_ONLY = ('id', 'updated_at')
+
+
+def _as_array(series, dtype):
+    if dtype == 'datetime64[ns]':
+        return pd.to_datetime(series).to_numpy(dtype)
+    if dtype is np.bool_:
+        return series.fillna(False).to_numpy(dtype)
+    if dtype in (np.int32, np.int64):
+        return series.fillna(0).to_numpy(dtype)
+    return series.to_numpy(dtype, na_value=np.nan)
+
+
+# Stream the training columns of the matching rows into typed arrays
+def _read_columns(where, size_hint, chunk_size):
+    statement = select(*[getattr(Disaster, name) for name, _ in TRAINING_COLUMNS]).where(*where)
+    arrays = {name: np.empty(size_hint, dtype=dtype) for name, dtype in TRAINING_COLUMNS}
+    filled = 0
+
+    # stream_results keeps PostgreSQL from buffering the whole result client-side
+    with db.engine.connect().execution_options(stream_results=True) as connection:
+        for chunk in pd.read_sql(statement, connection, chunksize=chunk_size):
+            end = filled + len(chunk)
+            if end > size_hint:
+                # More rows than counted; grow instead of failing
+                size_hint = max(end, size_hint * 2)
+                for name in arrays:
+                    arrays[name] = np.resize(arrays[name], size_hint)
+            for name, dtype in TRAINING_COLUMNS:
+                arrays[name][filled:end] = _as_array(chunk[name], dtype)
+            filled = end
+
+    return {name: array[:filled] for name, array in arrays.items()}
+
+
+def _load_snapshot(path):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as snapshot:
+            return {name: snapshot[name] for name, _ in TRAINING_COLUMNS}
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable training snapshot {path}: {str(e)}")
+        return None
+
+
+def _save_snapshot(path, arrays):
+    # Write next to the target and rename, so readers never see a partial file
+    temp_path = f"{path}.tmp.{os.getpid()}.npz"
+    try:
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, path)
+    except Exception as e:
+        logger.warning(f"Could not write training snapshot {path}: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+# Load the disaster columns used for model training as a typed DataFrame
+def load_training_frame(chunk_size=TRAINING_CHUNK_SIZE, snapshot_path=TRAINING_SNAPSHOT_PATH):
+    """
+    Read only the training columns, chunk by chunk, straight into
+    preallocated NumPy arrays, without building ORM objects or per-row
+    dicts. With a snapshot path, rows unchanged since the last snapshot
+    are taken from the file and only newer or updated rows are read.
+
+    Returns:
+        DataFrame with disaster_type_id, state_id, latitude, longitude,
+        severity, start_date and is_active (empty if there are no disasters)
+    """
+    start = time.perf_counter()
+    count, max_id = db.session.execute(select(func.count(Disaster.id), func.max(Disaster.id))).one()
+    db.session.rollback()  # End the read transaction; the arrays are read on their own connection
+    if not count:
+        return pd.DataFrame({name: np.empty(0, dtype=dtype) for name, dtype in TRAINING_COLUMNS
+                             if name not in _SNAPSHOT_ONLY})
+
+    arrays = None
+    snapshot = _load_snapshot(snapshot_path)
+    if snapshot is not None and len(snapshot['id']):
+        since_id = int(snapshot['id'].max())
+        since_updated = pd.Timestamp(snapshot['updated_at'].max())
+        is_changed = Disaster.id > since_id
+        if not pd.isna(since_updated):
+            is_changed = db.or_(is_changed, Disaster.updated_at >= since_updated.to_pydatetime())
+        changed = _read_columns(
+            [Disaster.id <= max_id, is_changed],
+            max(count - len(snapshot['id']), 0) + 1024, chunk_size
+        )
+        keep = ~np.isin(snapshot['id'], changed['id'])
+        merged = {name: np.concatenate([snapshot[name][keep], changed[name]]) for name, _ in TRAINING_COLUMNS}
+
+        # Deleted rows cannot be seen in a delta; fall back to a full read
+        if len(merged['id']) == count:
+            arrays = merged
+            logger.info(f"Training data: {len(changed['id'])} rows read on top of the snapshot")
+        else:
+            logger.info("Training snapshot is out of step with the database, reading all rows")
+
+    if arrays is None:
+        arrays = _read_columns([Disaster.id <= max_id], count, chunk_size)
+
+    if snapshot_path:
+        _save_snapshot(snapshot_path, arrays)
+
+    frame = pd.DataFrame({name: arrays[name] for name, _ in TRAINING_COLUMNS if name not in _SNAPSHOT_ONLY})
+    logger.info(f"Loaded {len(frame)} training rows ({frame.memory_usage(deep=True).sum() / 1e6:.1f} MB) "
+                f"in {time.perf_counter() - start:.2f}s")
+    return frame
@@ -0,0 +1,111 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from app import app, db
+from models import Disaster, DisasterAlert, RiskAssessment, DataVersion
+
+logger = logging.getLogger(__name__)
+
+# Models whose changes bump the data version
+TRACKED_MODELS = (Disaster, DisasterAlert, RiskAssessment)
+
+# How long (seconds) a worker trusts its cached copy of the data version.
+# Other workers' writes become visible after at most this long.
+DATA_VERSION_TTL = float(os.environ.get("DATA_VERSION_TTL", 2))
+
+DATA_VERSION_ROW_ID = 1
+
+_cached_version = None
+_cached_at = 0.0
+_cache_lock = threading.Lock()
+
+
+# Create the counter row if it does not exist yet
+def ensure_data_version_row():
+    with app.app_context():
+        if db.session.get(DataVersion, DATA_VERSION_ROW_ID) is None:
+            db.session.add(DataVersion(id=DATA_VERSION_ROW_ID, version=1, updated_at=datetime.utcnow()))
+            db.session.commit()
+
+
+# Current (version, updated_at), cached for DATA_VERSION_TTL seconds
+def current_data_version():
+    global _cached_version, _cached_at
+    now = time.monotonic()
+    cached = _cached_version
+    if cached is not None and now - _cached_at < DATA_VERSION_TTL:
+        return cached
+
+    row = db.session.execute(
+        select(DataVersion.version, DataVersion.updated_at).where(DataVersion.id == DATA_VERSION_ROW_ID)
+    ).first()
+    version = (row.version, row.updated_at) if row else (0, None)
+    with _cache_lock:
+        _cached_version = version
+        _cached_at = now
+    return version
+
+
+# Forget the cached version so the next read goes to the database
+def clear_data_version_cache():
+    global _cached_version
+    with _cache_lock:
+        _cached_version = None
+
+
+# Increment the counter inside the session's current transaction
+def bump_data_version(session=None):
+    session = session or db.session
+    if session.info.get('data_version_bumped'):
+        return
+    session.info['data_version_bumped'] = True
+    session.execute(
+        update(DataVersion)
+        .where(DataVersion.id == DATA_VERSION_ROW_ID)
+        .values(version=DataVersion.version + 1, updated_at=datetime.utcnow())
+    )
+
+
+def _is_tracked(obj):
+    return isinstance(obj, TRACKED_MODELS)
+
+
+# Unit-of-work changes: new, modified or deleted tracked instances
+@event.listens_for(Session, 'before_flush')
+def _track_flush(session, flush_context, instances):
+    if session.info.get('data_version_bumped'):
+        return
+    changed = (
+        any(_is_tracked(obj) for obj in session.new)
+        or any(_is_tracked(obj) for obj in session.deleted)
+        or any(_is_tracked(obj) and session.is_modified(obj) for obj in session.dirty)
+    )
+    if changed:
+        bump_data_version(session)
+
+
+# ORM-enabled bulk INSERT / UPDATE / DELETE statements on tracked models
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if any(mapper.class_ in TRACKED_MODELS for mapper in orm_execute_state.all_mappers):
+        bump_data_version(orm_execute_state.session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    if session.info.pop('data_version_bumped', False):
+        # This worker made the change, so it can see the new version immediately
+        clear_data_version_cache()
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _after_transaction_end(session, transaction):
+    # Rolled back or closed without commit: the bump was discarded too
+    if transaction.parent is None:
+        session.info.pop('data_version_bumped', None)
@@ -1,11 +1,11 @@
 import logging
 import json
-import requests
 import trafilatura
 import pandas as pd
 from datetime import datetime
 from io import BytesIO
 from app import app
+from http_client import http_client
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -24,8 +24,11 @@ def get_website_text_content(url: str) -> str:
     """
     try:
         # Send a request to the website
-        downloaded = trafilatura.fetch_url(url)
-        text = trafilatura.extract(downloaded)
+        response = http_client.get(url)
+        if response.status_code != 200:
+            logger.error(f"Failed to fetch {url}, status code: {response.status_code}")
+            return ""
+        text = trafilatura.extract(response.text)
         
         if not text:
             logger.warning(f"No content extracted from {url}")
@@ -51,7 +54,7 @@ def extract_pdf_text(pdf_url: str) -> str:
         import PyPDF2
         
         # Download the PDF
-        response = requests.get(pdf_url)
+        response = http_client.get(pdf_url)
         
         if response.status_code != 200:
             logger.error(f"Failed to download PDF from {pdf_url}, status code: {response.status_code}")